@@ -0,0 +1,332 @@
+import argparse
+import calendar
+import json
+import os
+import shutil
+from datetime import datetime
+from decimal import Decimal
+
+import numpy as np
+
+from wallet import WalletPaymentNetwork, transaction_tables
+
+# Fixed-width column layout of every month partition
+COLUMNS = {
+    'sender': np.uint32,
+    'recipient': np.uint32,
+    'amount_cents': np.int64,
+    'timestamp': np.int64
+}
+
+INDEX_FILE = 'index.json'
+FETCH_SIZE = 50000
+
+
+def ssn_to_id(ssn):
+    """Pack an XXX-XX-XXXX SSN into a 32 bit integer"""
+    return int(ssn.replace('-', ''))
+
+
+def id_to_ssn(value):
+    """Unpack an integer id back into XXX-XX-XXXX form"""
+    digits = f"{int(value):09d}"
+    return f"{digits[:3]}-{digits[3:5]}-{digits[5:]}"
+
+
+def month_bounds(month):
+    """Return the first instant of the month and of the month after it"""
+    start = datetime.strptime(month, '%Y-%m')
+    if start.month == 12:
+        end = start.replace(year=start.year + 1, month=1)
+    else:
+        end = start.replace(month=start.month + 1)
+    return start, end
+
+
+def month_range(first, last):
+    """List YYYY-MM keys from first to last inclusive"""
+    months = []
+    current, _ = month_bounds(first)
+    last_start, _ = month_bounds(last)
+    while current <= last_start:
+        months.append(f"{current:%Y-%m}")
+        _, current = month_bounds(f"{current:%Y-%m}")
+    return months
+
+
+class TransactionArchive:
+    """Month-partitioned columnar archive of SEND_TRANSACTION"""
+
+    def __init__(self, archive_dir):
+        self.archive_dir = archive_dir
+        self.index = {}
+
+        index_path = os.path.join(archive_dir, INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path) as f:
+                self.index = json.load(f)
+
+    def save_index(self):
+        """Atomically rewrite the partition index"""
+        os.makedirs(self.archive_dir, exist_ok=True)
+        index_path = os.path.join(self.archive_dir, INDEX_FILE)
+        with open(index_path + '.tmp', 'w') as f:
+            json.dump(self.index, f, indent=2, sort_keys=True)
+        os.replace(index_path + '.tmp', index_path)
+
+    # Export
+
+    def export_closed_months(self, first_month, last_month=None, force=False):
+        """Export every month up to last_month (default: last month) that is not archived yet.
+
+        Raises ValueError if last_month is the current month or later, since it is still open.
+        """
+        current_start, _ = month_bounds(f"{datetime.now():%Y-%m}")
+        if last_month is None:
+            last_month = f"{datetime.fromordinal(current_start.toordinal() - 1):%Y-%m}"
+        elif month_bounds(last_month)[0] >= current_start:
+            raise ValueError(f"{last_month} is not closed yet; only months before {current_start:%Y-%m} can be exported")
+
+        wallet = WalletPaymentNetwork()
+        conn = wallet.connect_db()
+        if not conn:
+            return []
+
+        exported = []
+        try:
+            for month in month_range(first_month, last_month):
+                if month in self.index and not force:
+                    continue
+                rows = self.export_month(conn, month)
+                exported.append((month, rows))
+        finally:
+            conn.close()
+
+        return exported
+
+    def export_month(self, conn, month):
+        """Stream one month of transfers into its partition files"""
+        start, end = month_bounds(month)
+        partition_dir = os.path.join(self.archive_dir, month)
+        staging_dir = partition_dir + '.tmp'
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        os.makedirs(staging_dir)
+
+        files = {
+            name: open(os.path.join(staging_dir, f"{name}.bin"), 'wb')
+            for name in COLUMNS
+        }
+        rows = 0
+        entry = {
+            'rows': 0,
+            'min_timestamp': None,
+            'max_timestamp': None,
+            'min_amount_cents': None,
+            'max_amount_cents': None
+        }
+
+        cursor = conn.cursor()
+        try:
+            # A partition archived by partitions.py lives in the archive table instead
+            for table in transaction_tables(cursor):
+                query = f"""
+                SELECT Sender_SSN, Recipient_SSN, Amount, Date_Time_Initiated
+                FROM {table}
+                WHERE Date_Time_Initiated >= %s AND Date_Time_Initiated < %s
+                AND Status = 'COMPLETED'
+                ORDER BY Date_Time_Initiated
+                """
+                cursor.execute(query, (start, end))
+
+                while True:
+                    chunk = cursor.fetchmany(FETCH_SIZE)
+                    if not chunk:
+                        break
+
+                    columns = {
+                        'sender': np.fromiter((ssn_to_id(row[0]) for row in chunk), COLUMNS['sender'], len(chunk)),
+                        'recipient': np.fromiter((ssn_to_id(row[1]) for row in chunk), COLUMNS['recipient'], len(chunk)),
+                        'amount_cents': np.fromiter(
+                            (int(Decimal(str(row[2])) * 100) for row in chunk), COLUMNS['amount_cents'], len(chunk)
+                        ),
+                        'timestamp': np.fromiter(
+                            (calendar.timegm(row[3].timetuple()) for row in chunk), COLUMNS['timestamp'], len(chunk)
+                        )
+                    }
+                    for name, values in columns.items():
+                        values.tofile(files[name])
+
+                    rows += len(chunk)
+                    for column, key in (('timestamp', 'timestamp'), ('amount_cents', 'amount_cents')):
+                        low = int(columns[column].min())
+                        high = int(columns[column].max())
+                        if entry[f'min_{key}'] is None or low < entry[f'min_{key}']:
+                            entry[f'min_{key}'] = low
+                        if entry[f'max_{key}'] is None or high > entry[f'max_{key}']:
+                            entry[f'max_{key}'] = high
+        finally:
+            cursor.close()
+            for f in files.values():
+                f.close()
+
+        # Swap the finished partition in so readers never see a half written month
+        shutil.rmtree(partition_dir, ignore_errors=True)
+        os.replace(staging_dir, partition_dir)
+
+        entry['rows'] = rows
+        self.index[month] = entry
+        self.save_index()
+        return rows
+
+    # Analytics
+
+    def months(self, start=None, end=None):
+        """Archived months overlapping [start, end], pruned with the min/max index"""
+        selected = []
+        for month in sorted(self.index):
+            entry = self.index[month]
+            if not entry['rows']:
+                continue
+            if start is not None and entry['max_timestamp'] < calendar.timegm(start.timetuple()):
+                continue
+            if end is not None and entry['min_timestamp'] >= calendar.timegm(end.timetuple()):
+                continue
+            selected.append(month)
+        return selected
+
+    def column(self, month, name):
+        """Memory-map one column of a partition without copying it"""
+        rows = self.index[month]['rows']
+        if not rows:
+            return np.empty(0, dtype=COLUMNS[name])
+        path = os.path.join(self.archive_dir, month, f"{name}.bin")
+        return np.memmap(path, dtype=COLUMNS[name], mode='r', shape=(rows,))
+
+    def _window(self, month, start, end):
+        """Row mask for partitions cut by the requested range, or None for a full month"""
+        entry = self.index[month]
+        start_ts = calendar.timegm(start.timetuple()) if start else None
+        end_ts = calendar.timegm(end.timetuple()) if end else None
+
+        if (start_ts is None or entry['min_timestamp'] >= start_ts) and \
+                (end_ts is None or entry['max_timestamp'] < end_ts):
+            return None
+
+        timestamps = self.column(month, 'timestamp')
+        mask = np.ones(len(timestamps), dtype=bool)
+        if start_ts is not None:
+            mask &= timestamps >= start_ts
+        if end_ts is not None:
+            mask &= timestamps < end_ts
+        return mask
+
+    def monthly_totals(self, start=None, end=None):
+        """Return (month, transfer count, total cents) for each archived month"""
+        totals = []
+        for month in self.months(start, end):
+            amounts = self.column(month, 'amount_cents')
+            mask = self._window(month, start, end)
+            if mask is not None:
+                amounts = amounts[mask]
+            totals.append((month, int(len(amounts)), int(amounts.sum())))
+        return totals
+
+    def user_flows(self, ssn, start=None, end=None):
+        """Return (month, cents sent, cents received, transfer count) for one user"""
+        user_id = ssn_to_id(ssn)
+        flows = []
+        for month in self.months(start, end):
+            amounts = self.column(month, 'amount_cents')
+            sent = self.column(month, 'sender') == user_id
+            received = self.column(month, 'recipient') == user_id
+            mask = self._window(month, start, end)
+            if mask is not None:
+                sent &= mask
+                received &= mask
+            count = int(np.count_nonzero(sent | received))
+            if count:
+                flows.append((month, int(amounts[sent].sum()), int(amounts[received].sum()), count))
+        return flows
+
+    def top_users(self, limit=10, start=None, end=None, by='sender'):
+        """Return the users moving the most money as (SSN, total cents, transfer count)"""
+        ids = []
+        totals = []
+        counts = []
+        for month in self.months(start, end):
+            users = self.column(month, by)
+            amounts = self.column(month, 'amount_cents')
+            mask = self._window(month, start, end)
+            if mask is not None:
+                users = users[mask]
+                amounts = amounts[mask]
+            unique, inverse, count = np.unique(users, return_inverse=True, return_counts=True)
+            ids.append(unique)
+            totals.append(np.bincount(inverse, weights=amounts, minlength=len(unique)).astype(np.int64))
+            counts.append(count)
+
+        if not ids:
+            return []
+
+        # Merge the per-month partial aggregates
+        unique, inverse = np.unique(np.concatenate(ids), return_inverse=True)
+        total = np.bincount(inverse, weights=np.concatenate(totals), minlength=len(unique)).astype(np.int64)
+        count = np.bincount(inverse, weights=np.concatenate(counts), minlength=len(unique)).astype(np.int64)
+
+        order = np.argsort(total)[::-1][:limit]
+        return [(id_to_ssn(unique[i]), int(total[i]), int(count[i])) for i in order]
+
+
+def parse_month(value):
+    """argparse type for YYYY-MM values"""
+    return f"{datetime.strptime(value, '%Y-%m'):%Y-%m}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar archive of closed SEND_TRANSACTION months")
+    parser.add_argument('--dir', default=os.getenv("ARCHIVE_DIR", "archive"), help="Archive directory")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = subparsers.add_parser('export', help="Export closed months from the live database")
+    export_parser.add_argument('--from', dest='first', type=parse_month, required=True)
+    export_parser.add_argument('--through', dest='last', type=parse_month)
+    export_parser.add_argument('--force', action='store_true', help="Re-export months already archived")
+
+    for name in ('monthly', 'flows', 'top'):
+        sub = subparsers.add_parser(name)
+        sub.add_argument('--start', type=parse_month)
+        sub.add_argument('--end', type=parse_month, help="Last month to include")
+        if name == 'flows':
+            sub.add_argument('--ssn', required=True)
+        if name == 'top':
+            sub.add_argument('--limit', type=int, default=10)
+            sub.add_argument('--by', choices=('sender', 'recipient'), default='sender')
+
+    args = parser.parse_args()
+    archive = TransactionArchive(args.dir)
+
+    if args.command == 'export':
+        try:
+            exported = archive.export_closed_months(args.first, args.last, args.force)
+        except ValueError as e:
+            parser.error(str(e))
+        for month, rows in exported:
+            print(f"{month}: archived {rows} transactions")
+        return
+
+    start = month_bounds(args.start)[0] if args.start else None
+    end = month_bounds(args.end)[1] if args.end else None
+
+    if args.command == 'monthly':
+        for month, count, cents in archive.monthly_totals(start, end):
+            print(f"{month}: {count} transfers, ${cents / 100:.2f}")
+    elif args.command == 'flows':
+        for month, sent, received, count in archive.user_flows(args.ssn, start, end):
+            print(f"{month}: Sent ${sent / 100:.2f}, Received ${received / 100:.2f} ({count} transfers)")
+    elif args.command == 'top':
+        for i, (ssn, cents, count) in enumerate(archive.top_users(args.limit, start, end, args.by), 1):
+            print(f"{i}. {ssn}: ${cents / 100:.2f} over {count} transfers")
+
+
+if __name__ == "__main__":
+    main()
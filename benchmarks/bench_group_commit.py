@@ -0,0 +1,122 @@
+"""Transfer throughput against added latency for different group-commit windows.
+
+Run from the repository root against a test database loaded with datagen.py:
+
+    python -m benchmarks.bench_group_commit --users 10000 --clients 32
+
+Window 0 is the default path: every client commits its own transfers on its own
+connection. Each transfer moves $0.01 between two generated users. Only committed
+transfers count towards throughput and latency; failures are reported separately.
+"""
+import argparse
+import threading
+import time
+from decimal import Decimal
+
+import numpy as np
+
+import datagen
+from group_commit import GroupCommitWriter
+from wallet import WalletPaymentNetwork
+
+AMOUNT = Decimal('0.01')
+
+
+def pairs(users, seed, chunk_size=1000):
+    """Endless (sender, recipient) SSN pairs, drawn a chunk at a time"""
+    rng = np.random.default_rng(seed)
+    while True:
+        senders = rng.integers(0, users, size=chunk_size)
+        recipients = (senders + rng.integers(1, users, size=chunk_size)) % users
+        for s, r in zip(senders, recipients):
+            yield datagen.user_ssn(s), datagen.user_ssn(r)
+
+
+def direct_client(wallet, transfers, deadline, latencies, failures):
+    conn = wallet.connect_db()
+    cursor = conn.cursor()
+    try:
+        for sender_ssn, recipient_ssn in transfers:
+            if time.monotonic() >= deadline:
+                break
+            started = time.perf_counter()
+            try:
+                wallet._apply_transfer(cursor, sender_ssn, recipient_ssn, AMOUNT, "Benchmark")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                failures.append(1)
+                continue
+            latencies.append(time.perf_counter() - started)
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def grouped_client(writer, transfers, deadline, latencies, failures):
+    for sender_ssn, recipient_ssn in transfers:
+        if time.monotonic() >= deadline:
+            break
+        started = time.perf_counter()
+        try:
+            writer.submit(sender_ssn, recipient_ssn, AMOUNT, "Benchmark").result()
+        except Exception:
+            failures.append(1)
+            continue
+        latencies.append(time.perf_counter() - started)
+
+
+def run(window_ms, args, seed):
+    wallet = WalletPaymentNetwork()
+    writer = GroupCommitWriter(wallet, window_ms, args.max_batch) if window_ms else None
+
+    deadline = time.monotonic() + args.duration
+    latencies = [[] for _ in range(args.clients)]
+    failures = [[] for _ in range(args.clients)]
+    threads = []
+    for i in range(args.clients):
+        transfers = pairs(args.users, seed + i)
+        if writer:
+            target, client_args = grouped_client, (writer, transfers, deadline, latencies[i], failures[i])
+        else:
+            target, client_args = direct_client, (wallet, transfers, deadline, latencies[i], failures[i])
+        threads.append(threading.Thread(target=target, args=client_args))
+
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    batches = None
+    if writer:
+        writer.close()
+        batches = writer.transfers / writer.batches if writer.batches else 0
+
+    failed = sum(len(values) for values in failures)
+    all_latencies = np.concatenate([np.array(values) for values in latencies]) * 1000
+    if not len(all_latencies):
+        return 0.0, float('nan'), float('nan'), batches, failed
+    return len(all_latencies) / elapsed, np.median(all_latencies), np.percentile(all_latencies, 99), batches, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Group-commit throughput and latency benchmark")
+    parser.add_argument('--users', type=int, required=True, help="Generated users loaded by datagen.py")
+    parser.add_argument('--windows', default='0,1,2,5,10,20', help="Window sizes in ms (0 = no grouping)")
+    parser.add_argument('--clients', type=int, default=32, help="Concurrent client threads")
+    parser.add_argument('--max-batch', type=int, default=100)
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds per window")
+    parser.add_argument('--seed', type=int, default=631)
+    args = parser.parse_args()
+
+    print(f"{'window ms':>9} {'transfers/s':>12} {'p50 ms':>8} {'p99 ms':>8} {'avg batch':>10} {'failed':>8}")
+    for window_ms in [float(window) for window in args.windows.split(',')]:
+        throughput, p50, p99, batch, failed = run(window_ms, args, args.seed)
+        batch = f"{batch:.1f}" if batch is not None else '-'
+        print(f"{window_ms:>9g} {throughput:>12.1f} {p50:>8.2f} {p99:>8.2f} {batch:>10} {failed:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Credit throughput for a single hot account as the number of balance slots K grows.
+
+Run from the repository root against a test database with the hot-account tables installed
+(python hot_accounts.py setup):
+
+    python -m benchmarks.bench_hot_account --ssn 123-45-6789 --threads 16
+
+Each credit is its own committed transaction of $0.01, so run it against a test database only.
+A zero credit would leave the slot row unchanged, which MySQL reports as 0 affected rows and
+_credit would treat as a no-longer-hot account. K=0 is the plain WALLET_ACCOUNT row update.
+"""
+import argparse
+import threading
+import time
+from decimal import Decimal
+
+import hot_accounts
+from wallet import WalletPaymentNetwork
+
+AMOUNT = Decimal('0.01')
+
+
+def worker(ssn, slots, deadline, counts, index):
+    wallet = WalletPaymentNetwork()
+    wallet.hot_accounts = {ssn: slots} if slots else {}
+    wallet.hot_accounts_loaded = float('inf')
+
+    conn = wallet.connect_db()
+    cursor = conn.cursor()
+    try:
+        while time.monotonic() < deadline:
+            wallet._credit(cursor, ssn, AMOUNT)
+            conn.commit()
+            counts[index] += 1
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def run(ssn, slots, threads, duration):
+    counts = [0] * threads
+    deadline = time.monotonic() + duration
+    pool = [
+        threading.Thread(target=worker, args=(ssn, slots, deadline, counts, i))
+        for i in range(threads)
+    ]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return sum(counts) / duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hot-account credit throughput benchmark")
+    parser.add_argument('--ssn', required=True, help="Account to credit")
+    parser.add_argument('--slots', default='0,1,2,4,8,16,32', help="Slot counts K to test")
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds per run")
+    args = parser.parse_args()
+
+    conn = WalletPaymentNetwork().connect_db()
+
+    print(f"{'K':>4} {'credits/s':>12} {'vs K=0':>8}")
+    baseline = None
+    try:
+        for slots in [int(k) for k in args.slots.split(',')]:
+            if slots:
+                hot_accounts.enable(conn, args.ssn, slots)
+            rate = run(args.ssn, slots, args.threads, args.duration)
+            baseline = baseline or rate
+            print(f"{slots:>4} {rate:>12.1f} {rate / baseline:>7.2f}x")
+    finally:
+        hot_accounts.disable(conn, args.ssn)
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
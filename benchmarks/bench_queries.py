@@ -0,0 +1,129 @@
+"""Repeatable read-query benchmark over the synthetic dataset from datagen.py.
+
+Measures the queries behind view_statements, get_account_info and recipient lookup.
+With --grow, the dataset is grown step by step and the corpus is re-run at every size:
+
+    python -m benchmarks.bench_queries --grow 10000,100000,1000000 --tx-per-user 20
+
+Without --grow the corpus runs against the generated users already in the database:
+
+    python -m benchmarks.bench_queries --users 1000000
+
+Statement ranges are anchored at --end-date, which must match the one the dataset was
+generated with. Recent-transaction lookups fall back to the full history when that date is
+more than RECENT_WINDOW_DAYS ago; pass a recent --end-date to measure the windowed path.
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import datagen
+from wallet import WalletPaymentNetwork
+
+
+def query_corpus(wallet, end_date):
+    """(name, function(cursor, user index, rng)) pairs run for every sampled user"""
+    last_day = datetime.strptime(end_date, '%Y-%m-%d').date() - timedelta(days=1)
+
+    def statement_year(cursor, index, rng):
+        wallet._fetch_statement(cursor, datagen.user_ssn(index), last_day - timedelta(days=365), last_day)
+
+    def statement_month(cursor, index, rng):
+        end = last_day - timedelta(days=int(rng.integers(0, 700)))
+        wallet._fetch_statement(cursor, datagen.user_ssn(index), end - timedelta(days=30), end)
+
+    def account_info(cursor, index, rng):
+        cursor.execute("""
+        SELECT Name, Email, Phone, Balance
+        FROM WALLET_ACCOUNT
+        WHERE SSN = %s
+        """, (datagen.user_ssn(index),))
+        cursor.fetchall()
+
+    def recent_transactions(cursor, index, rng):
+        wallet._recent_transactions(cursor, datagen.user_ssn(index))
+
+    def recipient_by_email(cursor, index, rng):
+        wallet._resolve_recipients(cursor, [datagen.user_email(index)])
+
+    def recipient_by_phone(cursor, index, rng):
+        wallet._resolve_recipients(cursor, [datagen.user_phone(index)])
+
+    return [
+        ('statement (1 year)', statement_year),
+        ('statement (30 days)', statement_month),
+        ('account info', account_info),
+        ('recent transactions', recent_transactions),
+        ('recipient by email', recipient_by_email),
+        ('recipient by phone', recipient_by_phone)
+    ]
+
+
+def run_corpus(wallet, conn, users, samples, seed, end_date):
+    """Time every corpus query for the same seeded sample of users"""
+    rng = np.random.default_rng(seed)
+    sample = rng.integers(0, users, size=samples)
+    cursor = conn.cursor()
+    results = []
+    try:
+        for name, query in query_corpus(wallet, end_date):
+            latencies = []
+            for index in sample:
+                started = time.perf_counter()
+                query(cursor, int(index), rng)
+                latencies.append(time.perf_counter() - started)
+            latencies = np.array(latencies) * 1000
+            results.append((name, np.median(latencies), np.percentile(latencies, 95), latencies.max()))
+    finally:
+        cursor.close()
+    return results
+
+
+def print_results(users, results):
+    print(f"\n--- {users:,} users ---")
+    print(f"{'query':<22} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}")
+    for name, p50, p95, worst in results:
+        print(f"{name:<22} {p50:>9.2f} {p95:>9.2f} {worst:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read-query latency benchmark")
+    parser.add_argument('--users', type=int, help="Generated users already loaded")
+    parser.add_argument('--grow', help="Comma separated user counts to grow the dataset through")
+    parser.add_argument('--tx-per-user', type=int, default=20, help="Transfers generated per new user")
+    parser.add_argument('--samples', type=int, default=200, help="Users sampled per query")
+    parser.add_argument('--seed', type=int, default=631)
+    parser.add_argument('--end-date', default=datagen.DEFAULT_END_DATE, help="End of the generated history")
+    parser.add_argument('--load-data', action='store_true', help="Grow through LOAD DATA LOCAL INFILE")
+    args = parser.parse_args()
+
+    if not args.users and not args.grow:
+        parser.error("Give --users or --grow")
+
+    wallet = WalletPaymentNetwork()
+    conn = datagen.connect(args.load_data)
+    if not conn:
+        return
+
+    try:
+        if args.grow:
+            loaded = args.users or 0
+            for target in [int(size) for size in args.grow.split(',')]:
+                added = target - loaded
+                if added > 0:
+                    datagen.generate(conn, added, added * args.tx_per_user, added * args.tx_per_user // 5,
+                                     seed=args.seed, existing_users=loaded, load_data=args.load_data,
+                                     end_date=args.end_date)
+                    loaded = target
+                print_results(loaded, run_corpus(wallet, conn, loaded, args.samples, args.seed, args.end_date))
+        else:
+            print_results(args.users, run_corpus(wallet, conn, args.users, args.samples, args.seed,
+                                                 args.end_date))
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Cost per recipient of N single send_money calls versus one multi-recipient batch.
+
+Run from the repository root against a test database:
+
+    python -m benchmarks.bench_split --sender 123-45-6789
+
+Every round is rolled back unless --commit is given, so balances are left untouched.
+"""
+import argparse
+import time
+from decimal import Decimal
+
+from wallet import WalletPaymentNetwork
+
+AMOUNT = Decimal('0.01')
+
+
+def pick_recipients(wallet, sender_ssn, count):
+    conn = wallet.connect_db()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+        SELECT EmailAddress FROM EMAIL_ADDRESS
+        WHERE SSN <> %s
+        LIMIT %s
+        """, (sender_ssn, count))
+        return [row[0] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def finish(conn, commit):
+    if commit:
+        conn.commit()
+    else:
+        conn.rollback()
+
+
+def run_single(wallet, sender_ssn, identifiers, commit):
+    """One connection, lookup, INSERT and two UPDATEs per recipient, like send_money"""
+    started = time.perf_counter()
+    for identifier in identifiers:
+        conn = wallet.connect_db()
+        cursor = conn.cursor()
+        try:
+            recipient_ssn = wallet._resolve_recipients(cursor, [identifier])[identifier]
+            wallet._apply_transfer(cursor, sender_ssn, recipient_ssn, AMOUNT, "Benchmark")
+            finish(conn, commit)
+        finally:
+            cursor.close()
+            conn.close()
+    return time.perf_counter() - started
+
+
+def run_batch(wallet, sender_ssn, identifiers, commit):
+    """One lookup, one executemany and one set-based UPDATE for all recipients"""
+    started = time.perf_counter()
+    conn = wallet.connect_db()
+    cursor = conn.cursor()
+    try:
+        recipients = wallet._resolve_recipients(cursor, identifiers)
+        transfers = [(recipients[identifier], AMOUNT, "Benchmark") for identifier in identifiers]
+        wallet._apply_transfers(cursor, sender_ssn, transfers)
+        finish(conn, commit)
+    finally:
+        cursor.close()
+        conn.close()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-recipient transfer benchmark")
+    parser.add_argument('--sender', required=True, help="Sender SSN")
+    parser.add_argument('--sizes', default='1,2,5,10,25,50,100', help="Recipient counts to test")
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--commit', action='store_true', help="Commit each round instead of rolling back")
+    args = parser.parse_args()
+
+    wallet = WalletPaymentNetwork()
+    sizes = [int(size) for size in args.sizes.split(',')]
+    available = pick_recipients(wallet, args.sender, max(sizes))
+
+    print(f"{'recipients':>10} {'single ms/recipient':>20} {'batch ms/recipient':>19} {'speedup':>8}")
+    for size in sizes:
+        if size > len(available):
+            print(f"Only {len(available)} recipients available, stopping.")
+            break
+        identifiers = available[:size]
+
+        single = min(run_single(wallet, args.sender, identifiers, args.commit) for _ in range(args.rounds))
+        batch = min(run_batch(wallet, args.sender, identifiers, args.commit) for _ in range(args.rounds))
+
+        print(f"{size:>10} {single / size * 1000:>20.3f} {batch / size * 1000:>19.3f} {single / batch:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+import argparse
+import csv
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import mysql.connector
+import numpy as np
+
+from wallet import WalletPaymentNetwork
+
+# Generated SSNs start here so they never collide with hand-entered test users
+SSN_BASE = 800000000
+PHONE_BASE = 2000000000
+
+FIRST_NAMES = ['Alex', 'Sam', 'Jordan', 'Taylor', 'Morgan', 'Casey', 'Riley', 'Jamie', 'Avery', 'Quinn',
+               'Priya', 'Wei', 'Omar', 'Sofia', 'Mateo', 'Aisha', 'Hiro', 'Lena', 'Noah', 'Zara']
+LAST_NAMES = ['Smith', 'Patel', 'Garcia', 'Kim', 'Nguyen', 'Johnson', 'Chen', 'Brown', 'Singh', 'Lopez',
+              'Khan', 'Davis', 'Cohen', 'Rossi', 'Muller', 'Silva', 'Ito', 'Novak', 'Okafor', 'Walsh']
+BANKS = ['Chase Bank', 'Bank of America', 'Wells Fargo', 'Citibank', 'Capital One', 'PNC Bank']
+MEMOS = ['Dinner', 'Rent', 'Groceries', 'Coffee', 'Tickets', 'Gas', 'Gift', 'Utilities', 'Transfer']
+
+# Generated history ends here (exclusive) unless --end-date says otherwise; a fixed date
+# keeps the timestamps, and so the whole dataset, identical from run to run
+DEFAULT_END_DATE = '2025-01-01'
+
+
+def user_ssn(index):
+    digits = f"{SSN_BASE + index:09d}"
+    return f"{digits[:3]}-{digits[3:5]}-{digits[5:]}"
+
+
+def user_email(index):
+    return f"user{SSN_BASE + index}@example.com"
+
+
+def user_phone(index):
+    return f"+1{PHONE_BASE + index}"
+
+
+class BulkWriter:
+    """Write row batches with executemany, or through LOAD DATA LOCAL INFILE"""
+
+    def __init__(self, conn, load_data=False):
+        self.conn = conn
+        self.load_data = load_data
+        self.cursor = conn.cursor()
+
+    def write(self, table, columns, rows):
+        if not rows:
+            return
+
+        if self.load_data:
+            with tempfile.NamedTemporaryFile('w', newline='', suffix='.csv', delete=False) as f:
+                csv.writer(f).writerows(rows)
+                path = f.name
+            try:
+                self.cursor.execute(f"""
+                LOAD DATA LOCAL INFILE %s INTO TABLE {table}
+                FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"'
+                LINES TERMINATED BY '\\r\\n'
+                ({', '.join(columns)})
+                """, (path,))
+            finally:
+                os.unlink(path)
+        else:
+            placeholders = ', '.join(['%s'] * len(columns))
+            self.cursor.executemany(
+                f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows
+            )
+        self.conn.commit()
+
+    def close(self):
+        self.cursor.close()
+
+
+def generate_users(writer, rng, first, count, batch_size):
+    """Insert users first..first+count-1 with their email, phone and bank account rows"""
+    for start in range(first, first + count, batch_size):
+        indexes = range(start, min(start + batch_size, first + count))
+        first_names = rng.integers(len(FIRST_NAMES), size=len(indexes))
+        last_names = rng.integers(len(LAST_NAMES), size=len(indexes))
+        balances = np.round(rng.lognormal(6, 1.2, size=len(indexes)), 2)
+        banks = rng.integers(len(BANKS), size=len(indexes))
+        bank_accounts = rng.integers(10 ** 9, 10 ** 12, size=len(indexes))
+
+        accounts, emails, phones, banks_rows = [], [], [], []
+        for i, index in enumerate(indexes):
+            ssn = user_ssn(index)
+            email = user_email(index)
+            phone = user_phone(index)
+            name = f"{FIRST_NAMES[first_names[i]]} {LAST_NAMES[last_names[i]]}"
+            accounts.append((ssn, name, 1, email, phone, float(balances[i])))
+            emails.append((ssn, email, 1, 1))
+            phones.append((ssn, phone, 1, 1))
+            banks_rows.append((
+                f"GEN{SSN_BASE + index}", str(bank_accounts[i]), ssn, BANKS[banks[i]],
+                'CHECKING', f"{21000021 + banks[i]:09d}", 1, 1
+            ))
+
+        writer.write('WALLET_ACCOUNT', ('SSN', 'Name', 'Confirmed', 'Email', 'Phone', 'Balance'), accounts)
+        writer.write('EMAIL_ADDRESS', ('SSN', 'EmailAddress', 'Is_Primary', 'Verified'), emails)
+        writer.write('PHONE', ('SSN', 'PhoneNumber', 'Is_Primary', 'Verified'), phones)
+        writer.write('BANK_ACCOUNT', ('BankID', 'BANUmber', 'WalletAccountSSN', 'Bank_Name', 'Account_Type',
+                                      'RoutingNumber', 'Is_Primary', 'Verified'), banks_rows)
+
+
+def activity_weights(rng, users, exponent):
+    """Power-law activity: the k-th most active user is weighted 1/k^exponent"""
+    weights = 1.0 / np.arange(1, users + 1) ** exponent
+    # Shuffle so the busiest users are spread across the SSN range
+    weights = weights[rng.permutation(users)]
+    return weights / weights.sum()
+
+
+def generate_transactions(writer, rng, table, status, users, count, years, end, batch_size, exponent=1.1):
+    """Insert count transfers between the first users accounts spread over the years before end"""
+    weights = activity_weights(rng, users, exponent)
+    span = int(timedelta(days=365 * years).total_seconds())
+    start = end - timedelta(seconds=span)
+
+    columns = ('Sender_SSN', 'Recipient_SSN', 'Amount', 'Memo', 'Status', 'Date_Time_Initiated')
+    for offset in range(0, count, batch_size):
+        size = min(batch_size, count - offset)
+        senders = rng.choice(users, size=size, p=weights)
+        recipients = rng.choice(users, size=size, p=weights)
+        # Nobody pays themselves
+        clash = senders == recipients
+        recipients[clash] = (recipients[clash] + 1) % users
+        amounts = np.round(rng.lognormal(3, 1.1, size=size), 2)
+        amounts[amounts < 0.01] = 0.01
+        seconds = np.sort(rng.integers(0, span, size=size))
+        memos = rng.integers(len(MEMOS), size=size)
+
+        rows = [
+            (user_ssn(senders[i]), user_ssn(recipients[i]), float(amounts[i]), MEMOS[memos[i]], status,
+             (start + timedelta(seconds=int(seconds[i]))).strftime('%Y-%m-%d %H:%M:%S'))
+            for i in range(size)
+        ]
+        writer.write(table, columns, rows)
+
+
+def connect(load_data=False):
+    wallet = WalletPaymentNetwork()
+    if not load_data:
+        return wallet.connect_db()
+    return mysql.connector.connect(**wallet.db_params, allow_local_infile=True)
+
+
+def generate(conn, users, transactions, requests, years=3, seed=631, existing_users=0,
+             batch_size=10000, load_data=False, end_date=DEFAULT_END_DATE):
+    """Add users and transaction history on top of existing_users generated users.
+
+    The same seed, existing_users and end_date always produce the same rows, so a dataset
+    can be grown step by step and rebuilt exactly.
+    """
+    rng = np.random.default_rng([seed, existing_users])
+    end = datetime.strptime(end_date, '%Y-%m-%d')
+    writer = BulkWriter(conn, load_data)
+    timings = {}
+    try:
+        started = time.perf_counter()
+        generate_users(writer, rng, existing_users, users, batch_size)
+        timings['users'] = time.perf_counter() - started
+
+        total_users = existing_users + users
+        started = time.perf_counter()
+        generate_transactions(writer, rng, 'SEND_TRANSACTION', 'COMPLETED',
+                              total_users, transactions, years, end, batch_size)
+        timings['transactions'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        generate_transactions(writer, rng, 'REQUEST_TRANSACTION', 'PENDING',
+                              total_users, requests, years, end, batch_size)
+        timings['requests'] = time.perf_counter() - started
+    finally:
+        writer.close()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seeded synthetic dataset generator")
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--transactions', type=int, default=1000000)
+    parser.add_argument('--requests', type=int, default=200000)
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--end-date', default=DEFAULT_END_DATE, help="End of the generated history (YYYY-MM-DD)")
+    parser.add_argument('--seed', type=int, default=631)
+    parser.add_argument('--existing-users', type=int, default=0,
+                        help="Generated users already in the database, to grow a dataset")
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--load-data', action='store_true', help="Bulk load through LOAD DATA LOCAL INFILE")
+    args = parser.parse_args()
+
+    conn = connect(args.load_data)
+    if not conn:
+        return
+
+    try:
+        timings = generate(conn, args.users, args.transactions, args.requests, args.years, args.seed,
+                           args.existing_users, args.batch_size, args.load_data, args.end_date)
+    finally:
+        conn.close()
+
+    for name, count in (('users', args.users), ('transactions', args.transactions), ('requests', args.requests)):
+        seconds = timings[name]
+        rate = count / seconds if seconds else 0
+        print(f"{name}: {count} rows in {seconds:.1f}s ({rate:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+import json
+import os
+import time
+from bisect import bisect_left, insort
+
+SNAPSHOT_VERSION = 1
+# Separates the search key from the SSN so equal keys for different users stay distinct
+SEPARATOR = '\x00'
+
+
+class ContactDirectory:
+    """In-memory prefix index over emails, phone numbers and names of wallet users.
+
+    `keys` is a sorted list of "<lowercase key>\\0<SSN>" strings, so a prefix query is one
+    binary search followed by a scan over the matching run. The directory only suggests
+    contacts; callers resolve the chosen email or phone against the database.
+    """
+
+    def __init__(self, built_at=None):
+        self.keys = []
+        self.entries = {}
+        self.names = {}
+        self.contacts = {}
+        self.built_at = built_at or time.time()
+
+    @staticmethod
+    def _keys(kind, value, ssn):
+        """Search keys for one contact value"""
+        value = value.lower()
+        if kind == 'name':
+            # Index the full name and every later word, so "smith" finds "Alex Smith"
+            words = value.split()
+            values = [' '.join(words[i:]) for i in range(len(words))]
+        elif kind == 'phone':
+            # Match with or without the +1 country code
+            value = value.lstrip('+')
+            values = [value, value[1:]] if len(value) == 11 and value.startswith('1') else [value]
+        else:
+            values = [value]
+        return [f"{value}{SEPARATOR}{ssn}" for value in values]
+
+    @classmethod
+    def build(cls, cursor):
+        """Load every email, phone and name from the database"""
+        directory = cls()
+        rows = []
+
+        cursor.execute("SELECT SSN, Name FROM WALLET_ACCOUNT")
+        for ssn, name in cursor.fetchall():
+            directory.names[ssn] = name
+            rows.extend((key, ssn, 'name', name) for key in cls._keys('name', name, ssn))
+
+        cursor.execute("SELECT SSN, EmailAddress FROM EMAIL_ADDRESS")
+        for ssn, email in cursor.fetchall():
+            rows.extend((key, ssn, 'email', email) for key in cls._keys('email', email, ssn))
+
+        cursor.execute("SELECT SSN, PhoneNumber FROM PHONE")
+        for ssn, phone in cursor.fetchall():
+            rows.extend((key, ssn, 'phone', phone) for key in cls._keys('phone', phone, ssn))
+
+        rows.sort()
+        directory.keys = [row[0] for row in rows]
+        directory.entries = {row[0]: (row[1], row[2], row[3]) for row in rows}
+        directory._index_contacts()
+        return directory
+
+    def _index_contacts(self):
+        """Emails and phones of each user, used to turn a name match into something payable"""
+        self.contacts = {}
+        for ssn, kind, value in self.entries.values():
+            if kind != 'name':
+                self.contacts.setdefault(ssn, {})[value] = kind
+
+    # Incremental updates
+
+    def add(self, kind, value, ssn, name=None):
+        if name is not None:
+            self.names[ssn] = name
+        for key in self._keys(kind, value, ssn):
+            self._insert(key, ssn, kind, value)
+        if kind != 'name':
+            self.contacts.setdefault(ssn, {})[value] = kind
+
+    def remove(self, kind, value, ssn):
+        for key in self._keys(kind, value, ssn):
+            self._delete(key)
+        if kind != 'name':
+            self.contacts.get(ssn, {}).pop(value, None)
+
+    def rename(self, ssn, name):
+        old_name = self.names.get(ssn)
+        if old_name:
+            self.remove('name', old_name, ssn)
+        self.add('name', name, ssn, name)
+
+    def _insert(self, key, ssn, kind, value):
+        if key not in self.entries:
+            insort(self.keys, key)
+        self.entries[key] = (ssn, kind, value)
+
+    def _delete(self, key):
+        if self.entries.pop(key, None) is None:
+            return
+        index = bisect_left(self.keys, key)
+        if index < len(self.keys) and self.keys[index] == key:
+            del self.keys[index]
+
+    # Queries
+
+    def _match(self, ssn, prefix):
+        """(SSN, kind, value) for one user's contact matching a prefix, preferring emails and phones"""
+        for value, kind in self.contacts.get(ssn, {}).items():
+            if any(key.startswith(prefix) for key in self._keys(kind, value, ssn)):
+                return ssn, kind, value
+        name = self.names.get(ssn)
+        if name and any(key.startswith(prefix) for key in self._keys('name', name, ssn)):
+            return ssn, 'name', name
+        return None
+
+    def search(self, prefix, pay_counts=None, limit=5, scan_limit=500):
+        """Contacts matching a prefix, most often paid first, as (SSN, name, email or phone)"""
+        prefix = prefix.strip().lower().lstrip('+')
+        if not prefix:
+            return []
+
+        pay_counts = pay_counts or {}
+        best = {}
+        # People the user already pays come first; the bounded scan below may never reach them
+        for ssn in sorted(pay_counts, key=pay_counts.get, reverse=True):
+            match = self._match(ssn, prefix)
+            if match:
+                best[ssn] = match
+                if len(best) >= limit:
+                    break
+
+        index = bisect_left(self.keys, prefix)
+        for key in self.keys[index:index + scan_limit]:
+            if not key.startswith(prefix):
+                break
+            ssn, kind, value = self.entries[key]
+            # One suggestion per user, preferring an email or phone over a name match
+            if ssn not in best or best[ssn][1] == 'name':
+                best[ssn] = (ssn, kind, value)
+
+        suggestions = []
+        for ssn, kind, value in best.values():
+            if kind == 'name':
+                # A name cannot be paid directly; offer one of the user's emails or phones instead
+                value = next(iter(self.contacts.get(ssn, {})), None)
+                if value is None:
+                    continue
+            suggestions.append((ssn, self.names.get(ssn, ''), value))
+
+        suggestions.sort(key=lambda suggestion: (-pay_counts.get(suggestion[0], 0), suggestion[2]))
+        return suggestions[:limit]
+
+    # Snapshots
+
+    def save(self, path):
+        """Write a snapshot that load() can read back without re-sorting.
+
+        The snapshot holds users' contact details, so it is created readable by the owner only.
+        """
+        snapshot = {
+            'version': SNAPSHOT_VERSION,
+            'built_at': self.built_at,
+            'names': self.names,
+            'entries': [[key, *self.entries[key]] for key in self.keys]
+        }
+        os.makedirs(os.path.dirname(path) or '.', mode=0o700, exist_ok=True)
+        fd = os.open(path + '.tmp', os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        os.fchmod(fd, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(snapshot, f, separators=(',', ':'))
+        os.replace(path + '.tmp', path)
+
+    @classmethod
+    def load(cls, path, max_age=None):
+        """Read a snapshot, or return None if it is missing, unreadable or older than max_age seconds"""
+        try:
+            with open(path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if snapshot.get('version') != SNAPSHOT_VERSION:
+            return None
+        if max_age is not None and time.time() - snapshot['built_at'] > max_age:
+            return None
+
+        directory = cls(snapshot['built_at'])
+        directory.names = snapshot['names']
+        directory.keys = [entry[0] for entry in snapshot['entries']]
+        directory.entries = {entry[0]: tuple(entry[1:]) for entry in snapshot['entries']}
+        directory._index_contacts()
+        return directory
@@ -0,0 +1,366 @@
+import argparse
+from decimal import Decimal
+
+import numpy as np
+
+from archive import id_to_ssn, ssn_to_id
+from wallet import WalletPaymentNetwork, transaction_tables
+
+FETCH_SIZE = 100000
+# Partial aggregates are merged once this many edges (and at least as many as the last
+# merge produced) have been buffered since that merge
+MERGE_THRESHOLD = 5000000
+# Incremental edges are folded into the CSR arrays once this many are pending
+COMPACT_THRESHOLD = 100000
+
+
+def edge_keys(src_ids, dst_ids):
+    """Pack (sender id, recipient id) pairs into sortable 64 bit keys"""
+    return (src_ids.astype(np.uint64) << np.uint64(32)) | dst_ids.astype(np.uint64)
+
+
+def aggregate(keys, counts, cents):
+    """Collapse duplicate edge keys, summing their counts and amounts"""
+    unique, inverse = np.unique(keys, return_inverse=True)
+    return (
+        unique,
+        np.bincount(inverse, weights=counts, minlength=len(unique)).astype(np.uint32),
+        np.bincount(inverse, weights=cents, minlength=len(unique)).astype(np.int64)
+    )
+
+
+class PaymentGraph:
+    """Sender to recipient adjacency over SEND_TRANSACTION in CSR form.
+
+    Each edge costs 16 bytes: an int32 recipient index, a uint32 transfer count and an
+    int64 total in cents. Nodes are SSNs packed into 32 bit ids, kept sorted in `nodes`.
+    """
+
+    def __init__(self, nodes, indptr, indices, counts, cents):
+        self.nodes = nodes
+        self.indptr = indptr
+        self.indices = indices
+        self.counts = counts
+        self.cents = cents
+        self.pending = {}
+        self._transpose = None
+
+    @classmethod
+    def from_edges(cls, keys, counts, cents):
+        """Build the CSR arrays from aggregated, sorted edge keys"""
+        src_ids = (keys >> np.uint64(32)).astype(np.uint32)
+        dst_ids = (keys & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+        nodes = np.union1d(src_ids, dst_ids)
+
+        src = np.searchsorted(nodes, src_ids)
+        indices = np.searchsorted(nodes, dst_ids).astype(np.int32)
+        indptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=len(nodes)), out=indptr[1:])
+        return cls(nodes, indptr, indices, counts, cents)
+
+    @classmethod
+    def build(cls, conn):
+        """Build the graph from completed transfers, archived months included, in one streaming pass"""
+        keys, counts, cents = [], [], []
+        buffered = 0
+        merged_size = 0
+
+        cursor = conn.cursor()
+        try:
+            for table in transaction_tables(cursor):
+                cursor.execute(f"""
+                SELECT Sender_SSN, Recipient_SSN, Amount
+                FROM {table}
+                WHERE Status = 'COMPLETED'
+                """)
+                while True:
+                    rows = cursor.fetchmany(FETCH_SIZE)
+                    if not rows:
+                        break
+
+                    size = len(rows)
+                    src_ids = np.fromiter((ssn_to_id(row[0]) for row in rows), np.uint32, size)
+                    dst_ids = np.fromiter((ssn_to_id(row[1]) for row in rows), np.uint32, size)
+                    amounts = np.fromiter((int(Decimal(str(row[2])) * 100) for row in rows), np.int64, size)
+
+                    chunk = aggregate(edge_keys(src_ids, dst_ids), np.ones(size, dtype=np.uint32), amounts)
+                    for parts, values in zip((keys, counts, cents), chunk):
+                        parts.append(values)
+                    buffered += len(chunk[0])
+
+                    # Growing the threshold with the merged size keeps the total merge work
+                    # proportional to the input instead of re-sorting everything per chunk
+                    if buffered > max(MERGE_THRESHOLD, merged_size):
+                        merged = aggregate(np.concatenate(keys), np.concatenate(counts), np.concatenate(cents))
+                        keys, counts, cents = [merged[0]], [merged[1]], [merged[2]]
+                        merged_size = len(merged[0])
+                        buffered = 0
+        finally:
+            cursor.close()
+
+        if not keys:
+            return cls.from_edges(np.empty(0, np.uint64), np.empty(0, np.uint32), np.empty(0, np.int64))
+        return cls.from_edges(*aggregate(np.concatenate(keys), np.concatenate(counts), np.concatenate(cents)))
+
+    # Incremental updates
+
+    def add_transfer(self, sender_ssn, recipient_ssn, amount):
+        """Record a new committed transfer; folded into the arrays once enough are pending.
+
+        Per-user queries read pending edges directly, so they never wait on a compaction.
+        Meant for a long-running process that holds a graph and commits transfers itself;
+        the wallet CLI does not keep one, and graph.py builds a fresh graph per run.
+        """
+        key = (ssn_to_id(sender_ssn), ssn_to_id(recipient_ssn))
+        count, cents = self.pending.get(key, (0, 0))
+        self.pending[key] = (count + 1, cents + int(Decimal(str(amount)) * 100))
+        if len(self.pending) >= COMPACT_THRESHOLD:
+            self.compact()
+
+    def compact(self):
+        """Merge pending edges into the CSR arrays"""
+        if not self.pending:
+            return
+
+        src = np.repeat(np.arange(len(self.nodes), dtype=np.int64), np.diff(self.indptr))
+        keys = edge_keys(self.nodes[src], self.nodes[self.indices])
+        pending = list(self.pending.items())
+        new_keys = edge_keys(
+            np.array([key[0] for key, _ in pending], dtype=np.uint32),
+            np.array([key[1] for key, _ in pending], dtype=np.uint32)
+        )
+        new_counts = np.array([value[0] for _, value in pending], dtype=np.uint32)
+        new_cents = np.array([value[1] for _, value in pending], dtype=np.int64)
+
+        merged = PaymentGraph.from_edges(*aggregate(
+            np.concatenate((keys, new_keys)),
+            np.concatenate((self.counts, new_counts)),
+            np.concatenate((self.cents, new_cents))
+        ))
+        self.nodes, self.indptr, self.indices = merged.nodes, merged.indptr, merged.indices
+        self.counts, self.cents = merged.counts, merged.cents
+        self.pending = {}
+        self._transpose = None
+
+    # Queries
+
+    def node(self, ssn):
+        """Dense index of an SSN, or None if it has no transfers"""
+        node_id = ssn_to_id(ssn)
+        index = np.searchsorted(self.nodes, node_id)
+        if index < len(self.nodes) and self.nodes[index] == node_id:
+            return int(index)
+        return None
+
+    def transpose(self):
+        """Lazily built recipient-major view: (indptr, sender indices, edge positions)"""
+        if self._transpose is None:
+            order = np.argsort(self.indices, kind='stable').astype(np.uint32)
+            src = np.repeat(np.arange(len(self.nodes), dtype=np.int32), np.diff(self.indptr))
+            indptr = np.zeros(len(self.nodes) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(self.indices, minlength=len(self.nodes)), out=indptr[1:])
+            self._transpose = (indptr, src[order], order)
+        return self._transpose
+
+    def _neighbors(self, index, direction):
+        """Node indices and edge positions adjacent to one node in the compacted arrays"""
+        if direction == 'out':
+            start, end = self.indptr[index], self.indptr[index + 1]
+            return self.indices[start:end], np.arange(start, end)
+        indptr, senders, order = self.transpose()
+        start, end = indptr[index], indptr[index + 1]
+        return senders[start:end], order[start:end]
+
+    def _pending_neighbors(self, node_id, direction):
+        """{other id: (count, cents)} for the pending edges of one node"""
+        neighbors = {}
+        for (src, dst), value in self.pending.items():
+            if direction == 'out' and src == node_id:
+                neighbors[dst] = value
+            elif direction == 'in' and dst == node_id:
+                neighbors[src] = value
+        return neighbors
+
+    def top_counterparties(self, ssn, limit=10, direction='out', by='cents'):
+        """Return (SSN, transfer count, total cents) of the users this user pays (or is paid by) most"""
+        node_id = ssn_to_id(ssn)
+        index = self.node(ssn)
+        if index is None:
+            other_ids = np.empty(0, dtype=np.uint32)
+            counts = np.empty(0, dtype=np.int64)
+            cents = np.empty(0, dtype=np.int64)
+        else:
+            others, edges = self._neighbors(index, direction)
+            other_ids = self.nodes[others]
+            counts = self.counts[edges].astype(np.int64)
+            cents = self.cents[edges].copy()
+
+        pending = self._pending_neighbors(node_id, direction)
+        if pending:
+            # Add pending edges on top of the compacted ones without rebuilding the arrays
+            positions = dict(zip(other_ids.tolist(), range(len(other_ids))))
+            new_ids, new_counts, new_cents = [], [], []
+            for other_id, (count, amount) in pending.items():
+                position = positions.get(other_id)
+                if position is None:
+                    new_ids.append(other_id)
+                    new_counts.append(count)
+                    new_cents.append(amount)
+                else:
+                    counts[position] += count
+                    cents[position] += amount
+            other_ids = np.concatenate((other_ids, np.array(new_ids, dtype=np.uint32)))
+            counts = np.concatenate((counts, np.array(new_counts, dtype=np.int64)))
+            cents = np.concatenate((cents, np.array(new_cents, dtype=np.int64)))
+
+        weights = cents if by == 'cents' else counts
+        top = np.argsort(weights)[::-1][:limit]
+        return [(id_to_ssn(other_ids[i]), int(counts[i]), int(cents[i])) for i in top]
+
+    def connected_components(self):
+        """Label weakly connected components; returns (labels per node, component sizes).
+
+        Whole-graph queries touch every edge anyway, so they compact pending edges first.
+        """
+        self.compact()
+        n = len(self.nodes)
+        labels = np.arange(n, dtype=np.int64)
+        src = np.repeat(np.arange(n, dtype=np.int64), np.diff(self.indptr))
+        dst = self.indices.astype(np.int64)
+
+        while True:
+            lowest = np.minimum(labels[src], labels[dst])
+            updated = labels.copy()
+            np.minimum.at(updated, src, lowest)
+            np.minimum.at(updated, dst, lowest)
+            # Pointer jumping shortcuts long label chains
+            while True:
+                jumped = updated[updated]
+                if np.array_equal(jumped, updated):
+                    break
+                updated = jumped
+            if np.array_equal(updated, labels):
+                break
+            labels = updated
+
+        _, dense, sizes = np.unique(labels, return_inverse=True, return_counts=True)
+        return dense, sizes
+
+    def reciprocal_pairs(self, limit=None):
+        """Pairs who pay each other, as (SSN a, SSN b, cents a to b, cents b to a), largest first"""
+        self.compact()
+        n = len(self.nodes)
+        src = np.repeat(np.arange(n, dtype=np.int64), np.diff(self.indptr))
+        dst = self.indices.astype(np.int64)
+
+        # CSR order keeps these keys sorted, so reverse edges are found by binary search
+        keys = src * n + dst
+        reverse = dst * n + src
+        position = np.searchsorted(keys, reverse)
+        position[position == len(keys)] = 0
+        mutual = (keys[position] == reverse) & (src < dst)
+
+        forward = np.nonzero(mutual)[0]
+        backward = position[mutual]
+        flows = np.minimum(self.cents[forward], self.cents[backward])
+        order = np.argsort(flows)[::-1][:limit]
+        return [
+            (id_to_ssn(self.nodes[src[forward[i]]]), id_to_ssn(self.nodes[dst[forward[i]]]),
+             int(self.cents[forward[i]]), int(self.cents[backward[i]]))
+            for i in order
+        ]
+
+    def k_hop(self, ssn, k, direction='out'):
+        """Return {SSN: hops} for everyone within k transfers of this user"""
+        if direction == 'out':
+            indptr, neighbors = self.indptr, self.indices
+        else:
+            indptr, neighbors, _ = self.transpose()
+
+        # Pending edges as an id-level adjacency, searched alongside the compacted arrays
+        pending = {}
+        for src, dst in self.pending:
+            if direction == 'out':
+                pending.setdefault(src, []).append(dst)
+            else:
+                pending.setdefault(dst, []).append(src)
+
+        node_id = ssn_to_id(ssn)
+        if self.node(ssn) is None and not any(node_id in edge for edge in self.pending):
+            return {}
+
+        # Walk in SSN ids so users that only appear in pending edges are reached too
+        distance = {node_id: 0}
+        frontier = [node_id]
+        for hop in range(1, k + 1):
+            if not frontier:
+                break
+            indexes = np.searchsorted(self.nodes, np.array(frontier, dtype=np.uint32))
+            reached = [
+                self.nodes[neighbors[indptr[u]:indptr[u + 1]]]
+                for u, node in zip(indexes.tolist(), frontier)
+                if u < len(self.nodes) and self.nodes[u] == node
+            ]
+            reached.extend(np.array(pending[node], dtype=np.uint32) for node in frontier if node in pending)
+            if not reached:
+                break
+            frontier = [v for v in np.unique(np.concatenate(reached)).tolist() if v not in distance]
+            for v in frontier:
+                distance[v] = hop
+
+        return {id_to_ssn(v): hops for v, hops in distance.items()}
+
+    def memory_bytes(self):
+        return sum(array.nbytes for array in (self.nodes, self.indptr, self.indices, self.counts, self.cents))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Payment graph analytics over SEND_TRANSACTION")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    top_parser = subparsers.add_parser('top', help="Top counterparties of a user")
+    top_parser.add_argument('--ssn', required=True)
+    top_parser.add_argument('--limit', type=int, default=10)
+    top_parser.add_argument('--direction', choices=('out', 'in'), default='out')
+
+    subparsers.add_parser('components', help="Connected component summary")
+
+    reciprocal_parser = subparsers.add_parser('reciprocal', help="Pairs who pay each other")
+    reciprocal_parser.add_argument('--limit', type=int, default=20)
+
+    khop_parser = subparsers.add_parser('khop', help="Users within k transfers")
+    khop_parser.add_argument('--ssn', required=True)
+    khop_parser.add_argument('--k', type=int, default=2)
+    khop_parser.add_argument('--direction', choices=('out', 'in'), default='out')
+
+    args = parser.parse_args()
+
+    conn = WalletPaymentNetwork().connect_db()
+    if not conn:
+        return
+    try:
+        graph = PaymentGraph.build(conn)
+    finally:
+        conn.close()
+
+    edges = len(graph.indices)
+    print(f"{len(graph.nodes)} users, {edges} edges, {graph.memory_bytes() / 2 ** 20:.1f} MiB "
+          f"({graph.memory_bytes() / max(edges, 1):.1f} bytes/edge)")
+
+    if args.command == 'top':
+        for i, (ssn, count, cents) in enumerate(graph.top_counterparties(args.ssn, args.limit, args.direction), 1):
+            print(f"{i}. {ssn}: ${cents / 100:.2f} over {count} transfers")
+    elif args.command == 'components':
+        _, sizes = graph.connected_components()
+        print(f"{len(sizes)} components, largest has {sizes.max() if len(sizes) else 0} users")
+    elif args.command == 'reciprocal':
+        for a, b, forward, backward in graph.reciprocal_pairs(args.limit):
+            print(f"{a} <-> {b}: ${forward / 100:.2f} / ${backward / 100:.2f}")
+    elif args.command == 'khop':
+        hops = graph.k_hop(args.ssn, args.k, args.direction)
+        for hop in range(1, args.k + 1):
+            print(f"{hop} hop(s): {sum(1 for value in hops.values() if value == hop)} users")
+
+
+if __name__ == "__main__":
+    main()
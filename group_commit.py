@@ -0,0 +1,127 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from mysql.connector import Error
+
+_STOP = object()
+
+
+class GroupCommitWriter:
+    """Single writer thread that applies queued transfers in micro-batches.
+
+    Each batch runs in one transaction and is committed once. Every transfer gets its own
+    savepoint, so a transfer that fails its balance check is rolled back alone and the rest
+    of the batch still commits. Callers wait on the Future returned by submit().
+    """
+
+    def __init__(self, wallet, window_ms=5, max_batch=100):
+        self.wallet = wallet
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.queue = queue.Queue()
+        self.batches = 0
+        self.transfers = 0
+        self.thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+        self.thread.start()
+
+    def submit(self, sender_ssn, recipient_ssn, amount, memo):
+        """Queue a transfer; the Future resolves once its batch has committed"""
+        future = Future()
+        self.queue.put((sender_ssn, recipient_ssn, amount, memo, future))
+        return future
+
+    def close(self):
+        """Drain the queue and stop the writer"""
+        self.queue.put(_STOP)
+        self.thread.join()
+
+    def _next_batch(self):
+        """Block for the first transfer, then collect more until the window or size limit"""
+        first = self.queue.get()
+        if first is _STOP:
+            return None, True
+
+        batch = [first]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        conn = None
+        stopping = False
+        while not stopping:
+            batch, stopping = self._next_batch()
+            if not batch:
+                continue
+
+            error = Error("Transfer was not applied")
+            try:
+                if conn is None or not conn.is_connected():
+                    conn = self.wallet.connect_db()
+                if conn is None:
+                    error = Error("Database connection unavailable")
+                else:
+                    self._apply(conn, batch)
+            except Exception as e:
+                # A failed batch must not stop the writer; its callers get the error instead
+                error = e
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+            finally:
+                # Never leave a caller waiting on a future nobody will resolve
+                for *_, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+
+        if conn is not None:
+            conn.close()
+
+    def _apply(self, conn, batch):
+        cursor = conn.cursor()
+        applied = []
+        try:
+            for i, (sender_ssn, recipient_ssn, amount, memo, future) in enumerate(batch):
+                cursor.execute(f"SAVEPOINT transfer_{i}")
+                try:
+                    self.wallet._apply_transfer(cursor, sender_ssn, recipient_ssn, amount, memo)
+                except Exception as e:
+                    cursor.execute(f"ROLLBACK TO SAVEPOINT transfer_{i}")
+                    future.set_exception(e)
+                else:
+                    applied.append((sender_ssn, recipient_ssn, amount, future))
+
+            conn.commit()
+        except Error as e:
+            # The transaction itself failed, so nothing in it was committed
+            try:
+                conn.rollback()
+            except Error:
+                pass
+            for *_, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            cursor.close()
+
+        self.batches += 1
+        self.transfers += len(applied)
+        for sender_ssn, recipient_ssn, amount, future in applied:
+            try:
+                self.wallet._after_transfer_commit(sender_ssn, recipient_ssn, amount)
+            except Exception as e:
+                # The transfer is committed, so its caller still succeeds
+                print("Post-commit update failed:", e)
+            future.set_result(True)
@@ -0,0 +1,154 @@
+import argparse
+import time
+
+from wallet import WalletPaymentNetwork, fold_slots
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS HOT_ACCOUNT (
+        SSN VARCHAR(11) PRIMARY KEY,
+        Slots INT NOT NULL,
+        FOREIGN KEY (SSN) REFERENCES WALLET_ACCOUNT(SSN)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS BALANCE_SLOT (
+        SSN VARCHAR(11) NOT NULL,
+        Slot INT NOT NULL,
+        Balance DECIMAL(15, 2) NOT NULL DEFAULT 0,
+        PRIMARY KEY (SSN, Slot),
+        FOREIGN KEY (SSN) REFERENCES WALLET_ACCOUNT(SSN)
+    )
+    """
+)
+
+
+def setup(conn):
+    cursor = conn.cursor()
+    try:
+        for statement in SCHEMA:
+            cursor.execute(statement)
+        conn.commit()
+    finally:
+        cursor.close()
+
+
+def enable(conn, ssn, slots):
+    """Put an account in hot-account mode with the given number of balance slots"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+        INSERT INTO HOT_ACCOUNT (SSN, Slots) VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE Slots = VALUES(Slots)
+        """, (ssn, slots))
+        # Pre-create the slot rows so credits update existing rows instead of inserting
+        cursor.executemany("""
+        INSERT IGNORE INTO BALANCE_SLOT (SSN, Slot, Balance) VALUES (%s, %s, 0)
+        """, [(ssn, slot) for slot in range(slots)])
+        # Slots beyond a reduced count are folded so no credit is stranded
+        fold_slots(cursor, ssn)
+        cursor.execute("DELETE FROM BALANCE_SLOT WHERE SSN = %s AND Slot >= %s", (ssn, slots))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def disable(conn, ssn):
+    """Fold an account's slots back into its main balance and leave hot-account mode"""
+    cursor = conn.cursor()
+    try:
+        # Delete the HOT_ACCOUNT row first: its lock holds off slot credits until we commit,
+        # after which they see the account is no longer hot and credit the main row
+        cursor.execute("DELETE FROM HOT_ACCOUNT WHERE SSN = %s", (ssn,))
+        fold_slots(cursor, ssn)
+        cursor.execute("DELETE FROM BALANCE_SLOT WHERE SSN = %s", (ssn,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def fold_all(conn):
+    """Fold every hot account, one short transaction each.
+
+    Slot rows left behind by an account that is no longer hot are folded and removed too.
+    """
+    cursor = conn.cursor()
+    folded = []
+    try:
+        cursor.execute("""
+        SELECT SSN, FALSE FROM HOT_ACCOUNT
+        UNION
+        SELECT DISTINCT bs.SSN, TRUE
+        FROM BALANCE_SLOT bs
+        LEFT JOIN HOT_ACCOUNT ha ON ha.SSN = bs.SSN
+        WHERE ha.SSN IS NULL
+        """)
+        for ssn, stranded in cursor.fetchall():
+            try:
+                amount = fold_slots(cursor, ssn)
+                if stranded:
+                    cursor.execute("DELETE FROM BALANCE_SLOT WHERE SSN = %s", (ssn,))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            folded.append((ssn, amount))
+    finally:
+        cursor.close()
+    return folded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sub-ledger balance slots for hot accounts")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('setup', help="Create the HOT_ACCOUNT and BALANCE_SLOT tables")
+
+    enable_parser = subparsers.add_parser('enable', help="Spread an account's credits over K slots")
+    enable_parser.add_argument('--ssn', required=True)
+    enable_parser.add_argument('--slots', type=int, default=16)
+
+    disable_parser = subparsers.add_parser('disable', help="Return an account to a single balance row")
+    disable_parser.add_argument('--ssn', required=True)
+
+    fold_parser = subparsers.add_parser('fold', help="Fold slot balances into main balances")
+    fold_parser.add_argument('--interval', type=int, help="Keep folding every N seconds")
+
+    args = parser.parse_args()
+
+    conn = WalletPaymentNetwork().connect_db()
+    if not conn:
+        return
+
+    try:
+        if args.command == 'setup':
+            setup(conn)
+            print("Hot-account tables created.")
+        elif args.command == 'enable':
+            if args.slots < 1:
+                print("Slots must be at least 1.")
+                return
+            enable(conn, args.ssn, args.slots)
+            print(f"{args.ssn} now uses {args.slots} balance slots.")
+        elif args.command == 'disable':
+            disable(conn, args.ssn)
+            print(f"{args.ssn} is back to a single balance row.")
+        elif args.command == 'fold':
+            while True:
+                for ssn, amount in fold_all(conn):
+                    print(f"{ssn}: folded ${amount:.2f}")
+                if not args.interval:
+                    break
+                time.sleep(args.interval)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
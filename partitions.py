@@ -0,0 +1,238 @@
+import argparse
+from datetime import datetime
+
+from mysql.connector import Error
+
+from archive import month_bounds
+from wallet import ARCHIVE_SUFFIX, WalletPaymentNetwork
+
+# Tables partitioned by month on Date_Time_Initiated.
+# MySQL requires the partitioning column in every unique key, so the primary key
+# of both tables must include Date_Time_Initiated before setup is run.
+PARTITIONED_TABLES = ('SEND_TRANSACTION', 'REQUEST_TRANSACTION')
+
+CATCH_ALL = 'p_future'
+
+
+def partition_name(month_start):
+    return f"p{month_start:%Y%m}"
+
+
+def next_month(month_start):
+    return month_bounds(f"{month_start:%Y-%m}")[1]
+
+
+def add_months(month_start, months):
+    for _ in range(months):
+        month_start = next_month(month_start)
+    return month_start
+
+
+class PartitionManager:
+    """Monthly RANGE partitioning and archival of the transaction tables"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def existing_partitions(self, table):
+        """Return {partition name: exclusive upper bound} for a table"""
+        cursor = self.conn.cursor()
+        try:
+            query = """
+            SELECT PARTITION_NAME, PARTITION_DESCRIPTION
+            FROM INFORMATION_SCHEMA.PARTITIONS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+            AND PARTITION_NAME IS NOT NULL
+            ORDER BY PARTITION_ORDINAL_POSITION
+            """
+            cursor.execute(query, (table,))
+            return dict(cursor.fetchall())
+        finally:
+            cursor.close()
+
+    def setup(self, table, first_month, months_ahead=3):
+        """Convert a table to monthly partitions from first_month up to months_ahead from now"""
+        start = datetime.strptime(first_month, '%Y-%m')
+        last = add_months(datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0), months_ahead)
+
+        # Rows older than first_month land in the first partition
+        definitions = []
+        month = start
+        while month <= last:
+            upper = next_month(month)
+            definitions.append(f"PARTITION {partition_name(month)} VALUES LESS THAN (TO_DAYS('{upper:%Y-%m-%d}'))")
+            month = upper
+        definitions.append(f"PARTITION {CATCH_ALL} VALUES LESS THAN MAXVALUE")
+
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(f"""
+            ALTER TABLE {table}
+            PARTITION BY RANGE (TO_DAYS(Date_Time_Initiated)) (
+                {', '.join(definitions)}
+            )
+            """)
+        finally:
+            cursor.close()
+
+    def create_future_partitions(self, table, months_ahead=3):
+        """Split new monthly partitions off the catch-all so upcoming months never land in it"""
+        partitions = self.existing_partitions(table)
+        monthly = sorted(name for name in partitions if name != CATCH_ALL)
+        if not monthly:
+            print(f"{table} is not partitioned. Run setup first.")
+            return []
+
+        month = next_month(datetime.strptime(monthly[-1][1:], '%Y%m'))
+        target = add_months(datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0), months_ahead)
+
+        created = []
+        definitions = []
+        while month <= target:
+            upper = next_month(month)
+            definitions.append(f"PARTITION {partition_name(month)} VALUES LESS THAN (TO_DAYS('{upper:%Y-%m-%d}'))")
+            created.append(partition_name(month))
+            month = upper
+
+        if not definitions:
+            return []
+
+        # Reorganizing an empty catch-all partition is a metadata-only change
+        definitions.append(f"PARTITION {CATCH_ALL} VALUES LESS THAN MAXVALUE")
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(f"""
+            ALTER TABLE {table}
+            REORGANIZE PARTITION {CATCH_ALL} INTO (
+                {', '.join(definitions)}
+            )
+            """)
+        finally:
+            cursor.close()
+        return created
+
+    def primary_key(self, table):
+        """Primary key columns of a table, in key order"""
+        cursor = self.conn.cursor()
+        try:
+            query = """
+            SELECT COLUMN_NAME
+            FROM INFORMATION_SCHEMA.KEY_COLUMN_USAGE
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND CONSTRAINT_NAME = 'PRIMARY'
+            ORDER BY ORDINAL_POSITION
+            """
+            cursor.execute(query, (table,))
+            return [row[0] for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+
+    def archive_partition(self, table, partition, batch_size=5000):
+        """Move one cold partition into {table}_ARCHIVE in bounded batches, then drop it"""
+        archive_table = f"{table}{ARCHIVE_SUFFIX}"
+        key = ', '.join(self.primary_key(table))
+        moved = 0
+
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS {archive_table} LIKE {table}")
+            cursor.execute(f"ALTER TABLE {archive_table} REMOVE PARTITIONING")
+        except Error:
+            # Already created without partitions on an earlier run
+            pass
+
+        try:
+            while True:
+                # Cut the batch at the primary key of the row after the first batch_size rows.
+                # Keys are unique, so every batch moves exactly batch_size rows and the loop
+                # always progresses, however many rows share a timestamp.
+                cursor.execute(f"""
+                SELECT {key} FROM {table} PARTITION ({partition})
+                ORDER BY {key}
+                LIMIT 1 OFFSET %s
+                """, (batch_size,))
+                row = cursor.fetchone()
+
+                if row:
+                    condition = f"WHERE ({key}) < ({', '.join(['%s'] * len(row))})"
+                    params = tuple(row)
+                else:
+                    condition = ""
+                    params = ()
+
+                cursor.execute(f"""
+                INSERT INTO {archive_table}
+                SELECT * FROM {table} PARTITION ({partition}) {condition}
+                """, params)
+                cursor.execute(f"DELETE FROM {table} PARTITION ({partition}) {condition}", params)
+                moved += cursor.rowcount
+                self.conn.commit()
+
+                if not row:
+                    break
+
+            cursor.execute(f"ALTER TABLE {table} DROP PARTITION {partition}")
+        except Error:
+            self.conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+        return moved
+
+    def archive_older_than(self, table, keep_months, batch_size=5000):
+        """Archive every monthly partition that ends before the last keep_months months"""
+        current = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        cutoff = current
+        for _ in range(keep_months):
+            cutoff = datetime.fromordinal(cutoff.toordinal() - 1).replace(day=1)
+
+        archived = []
+        for name in self.existing_partitions(table):
+            if name == CATCH_ALL:
+                continue
+            if datetime.strptime(name[1:], '%Y%m') < cutoff:
+                archived.append((name, self.archive_partition(table, name, batch_size)))
+        return archived
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monthly partitions for the transaction tables")
+    parser.add_argument('--table', choices=PARTITIONED_TABLES, action='append',
+                        help="Table to manage (default: all)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    setup_parser = subparsers.add_parser('setup', help="Partition the tables by month")
+    setup_parser.add_argument('--from', dest='first', required=True, help="Oldest month to partition (YYYY-MM)")
+    setup_parser.add_argument('--ahead', type=int, default=3, help="Future months to create")
+
+    extend_parser = subparsers.add_parser('extend', help="Create upcoming monthly partitions")
+    extend_parser.add_argument('--ahead', type=int, default=3, help="Future months to create")
+
+    archive_parser = subparsers.add_parser('archive', help="Move cold partitions to archive tables")
+    archive_parser.add_argument('--keep', type=int, default=12, help="Recent months to keep live")
+    archive_parser.add_argument('--batch-size', type=int, default=5000)
+
+    args = parser.parse_args()
+
+    conn = WalletPaymentNetwork().connect_db()
+    if not conn:
+        return
+
+    manager = PartitionManager(conn)
+    try:
+        for table in args.table or PARTITIONED_TABLES:
+            if args.command == 'setup':
+                manager.setup(table, args.first, args.ahead)
+                print(f"{table}: partitioned by month from {args.first}")
+            elif args.command == 'extend':
+                created = manager.create_future_partitions(table, args.ahead)
+                print(f"{table}: created {len(created)} partitions {' '.join(created)}")
+            elif args.command == 'archive':
+                for name, moved in manager.archive_older_than(table, args.keep, args.batch_size):
+                    print(f"{table}: archived {name} ({moved} rows)")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,500 @@
+import argparse
+import os
+import secrets
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from wallet import WalletPaymentNetwork, apply_balance_deltas
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS BANK_TRANSFER (
+    Transfer_ID BIGINT AUTO_INCREMENT PRIMARY KEY,
+    SSN VARCHAR(11) NOT NULL,
+    BankID VARCHAR(30) NOT NULL,
+    Direction VARCHAR(10) NOT NULL,
+    Amount_Cents BIGINT NOT NULL,
+    Status VARCHAR(10) NOT NULL DEFAULT 'PENDING',
+    Batch_ID VARCHAR(20),
+    Return_Code CHAR(3),
+    Date_Time_Initiated DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    Date_Time_Settled DATETIME,
+    INDEX (Status),
+    INDEX (Batch_ID, Status, Transfer_ID),
+    FOREIGN KEY (SSN) REFERENCES WALLET_ACCOUNT(SSN)
+)
+"""
+
+# Top-ups pull from the user's bank (ACH debit), withdrawals push to it (ACH credit)
+TOPUP = 'TOPUP'
+WITHDRAWAL = 'WITHDRAWAL'
+TRANSACTION_CODES = {
+    (WITHDRAWAL, 'CHECKING'): '22',
+    (TOPUP, 'CHECKING'): '27',
+    (WITHDRAWAL, 'SAVINGS'): '32',
+    (TOPUP, 'SAVINGS'): '37'
+}
+
+RECORD_SIZE = 94
+BLOCKING_FACTOR = 10
+CLAIM_CHUNK = 50000
+FETCH_SIZE = 20000
+
+
+def field(value, width, numeric=False):
+    """Fixed-width ACH field: numbers zero-padded on the left, text space-padded on the right"""
+    value = str(value)
+    if numeric:
+        return value.rjust(width, '0')[-width:]
+    return value.upper().ljust(width)[:width]
+
+
+class AchFileWriter:
+    """Streams one ACH-style file, one batch per receiving routing number"""
+
+    def __init__(self, f, origin_routing, company_id, company_name, destination_routing, destination_name):
+        self.f = f
+        self.origin_routing = field(origin_routing, 9, True)
+        self.company_id = field(company_id, 10)
+        self.company_name = company_name
+        self.destination_routing = field(destination_routing, 9, True)
+        self.destination_name = destination_name
+        self.records = 0
+        self.batch_count = 0
+        self.entry_count = 0
+        self.entry_hash = 0
+        self.total_debit = 0
+        self.total_credit = 0
+        self.batch = None
+
+    def write(self, record):
+        assert len(record) == RECORD_SIZE, record
+        self.f.write(record + '\n')
+        self.records += 1
+
+    def file_header(self, created):
+        self.write(
+            '101'
+            + ' ' + self.destination_routing
+            + ' ' + self.origin_routing
+            + created.strftime('%y%m%d%H%M')
+            + 'A094101'
+            + field(self.destination_name, 23)
+            + field(self.company_name, 23)
+            + ' ' * 8
+        )
+
+    def begin_batch(self, effective_date):
+        self.batch_count += 1
+        self.batch = {'entries': 0, 'hash': 0, 'debit': 0, 'credit': 0}
+        self.write(
+            '5200'
+            + field(self.company_name, 16)
+            + ' ' * 20
+            + self.company_id
+            + 'PPD'
+            + field('WALLET', 10)
+            + effective_date.strftime('%y%m%d')
+            + effective_date.strftime('%y%m%d')
+            + '   '
+            + '1'
+            + self.origin_routing[:8]
+            + field(self.batch_count, 7, True)
+        )
+
+    def entry(self, transaction_code, routing_number, account_number, cents, transfer_id, name):
+        routing_number = field(routing_number, 9, True)
+        sequence = field(transfer_id, 7, True)
+        self.write(
+            '6'
+            + transaction_code
+            + routing_number
+            + field(account_number, 17)
+            + field(cents, 10, True)
+            + field(transfer_id, 15)
+            + field(name, 22)
+            + '  '
+            + '0'
+            + self.origin_routing[:8] + sequence
+        )
+
+        self.batch['entries'] += 1
+        self.batch['hash'] += int(routing_number[:8])
+        if transaction_code in ('27', '37'):
+            self.batch['debit'] += cents
+        else:
+            self.batch['credit'] += cents
+
+    def end_batch(self):
+        batch = self.batch
+        self.write(
+            '8200'
+            + field(batch['entries'], 6, True)
+            + field(batch['hash'], 10, True)
+            + field(batch['debit'], 12, True)
+            + field(batch['credit'], 12, True)
+            + self.company_id
+            + ' ' * 25
+            + self.origin_routing[:8]
+            + field(self.batch_count, 7, True)
+        )
+        self.entry_count += batch['entries']
+        self.entry_hash += batch['hash']
+        self.total_debit += batch['debit']
+        self.total_credit += batch['credit']
+        self.batch = None
+
+    def file_control(self):
+        records = self.records + 1
+        blocks = -(-records // BLOCKING_FACTOR)
+        self.write(
+            '9'
+            + field(self.batch_count, 6, True)
+            + field(blocks, 6, True)
+            + field(self.entry_count, 8, True)
+            + field(self.entry_hash, 10, True)
+            + field(self.total_debit, 12, True)
+            + field(self.total_credit, 12, True)
+            + ' ' * 39
+        )
+        # Pad the last block with all-9 filler records
+        while self.records % BLOCKING_FACTOR:
+            self.write('9' * RECORD_SIZE)
+
+
+def setup(conn):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(SCHEMA)
+        conn.commit()
+    finally:
+        cursor.close()
+
+
+def new_batch(output_dir):
+    """Reserve a unique batch id by creating its temporary file; returns (id, file path)"""
+    os.makedirs(output_dir, exist_ok=True)
+    while True:
+        # Timestamp for readability, random suffix so runs in the same second never share an id
+        batch_id = datetime.now().strftime('B%y%m%d%H%M%S') + secrets.token_hex(3)
+        path = os.path.join(output_dir, f"{batch_id}.ach")
+        if os.path.exists(path):
+            continue
+        try:
+            open(path + '.tmp', 'x').close()
+        except FileExistsError:
+            continue
+        return batch_id, path
+
+
+def release_batch(conn, batch_id):
+    """Put a batch's still-BATCHED entries back in the queue; returns how many were released"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+        UPDATE BANK_TRANSFER
+        SET Status = 'PENDING', Batch_ID = NULL
+        WHERE Batch_ID = %s AND Status = 'BATCHED'
+        """, (batch_id,))
+        released = cursor.rowcount
+        conn.commit()
+    finally:
+        cursor.close()
+    return released
+
+
+def create_batch(conn, output_dir):
+    """Claim all pending entries into a new batch and stream its settlement file.
+
+    Returns (file path or None, entries written, entries failed). Entries whose bank account
+    no longer exists cannot be written; they are marked FAILED and withdrawals are refunded.
+    The file is written to a temporary name and only renamed once complete; if writing fails,
+    the claimed entries are released back to PENDING.
+    """
+    batch_id, path = new_batch(output_dir)
+
+    cursor = conn.cursor()
+    try:
+        # Claim in bounded chunks so the live queue is never locked for long
+        claimed = 0
+        while True:
+            cursor.execute("""
+            UPDATE BANK_TRANSFER
+            SET Status = 'BATCHED', Batch_ID = %s
+            WHERE Status = 'PENDING'
+            ORDER BY Transfer_ID
+            LIMIT %s
+            """, (batch_id, CLAIM_CHUNK))
+            claimed += cursor.rowcount
+            conn.commit()
+            if cursor.rowcount < CLAIM_CHUNK:
+                break
+
+        if not claimed:
+            os.unlink(path + '.tmp')
+            return None, 0, 0
+
+        try:
+            written, unwritable = write_batch_file(cursor, batch_id, path + '.tmp')
+        except BaseException:
+            os.unlink(path + '.tmp')
+            try:
+                # Drain any unread rows so the connection can run the release
+                cursor.fetchall()
+            except Exception:
+                pass
+            release_batch(conn, batch_id)
+            raise
+
+        if written:
+            os.replace(path + '.tmp', path)
+        else:
+            os.unlink(path + '.tmp')
+            path = None
+
+        fail_entries(conn, cursor, unwritable, 'NBA')
+    finally:
+        cursor.close()
+
+    return path, written, len(unwritable)
+
+
+def write_batch_file(cursor, batch_id, path):
+    """Stream a batch's entries into a settlement file; returns (entries written, unwritable entries)"""
+    cursor.execute("""
+    SELECT bt.Transfer_ID, bt.SSN, bt.Direction, bt.Amount_Cents,
+           ba.RoutingNumber, ba.BANUmber, ba.Account_Type, wa.Name
+    FROM BANK_TRANSFER bt
+    LEFT JOIN BANK_ACCOUNT ba ON ba.BankID = bt.BankID
+    JOIN WALLET_ACCOUNT wa ON wa.SSN = bt.SSN
+    WHERE bt.Batch_ID = %s
+    ORDER BY ba.RoutingNumber, bt.Transfer_ID
+    """, (batch_id,))
+
+    now = datetime.now()
+    with open(path, 'w', buffering=1 << 20) as f:
+        writer = AchFileWriter(
+            f,
+            os.getenv("ACH_ORIGIN_ROUTING", "000000000"),
+            os.getenv("ACH_COMPANY_ID", "WALLETNET"),
+            os.getenv("ACH_COMPANY_NAME", "WALLET PAYMENT"),
+            os.getenv("ACH_DESTINATION_ROUTING", "000000000"),
+            os.getenv("ACH_DESTINATION_NAME", "FEDERAL RESERVE")
+        )
+        writer.file_header(now)
+
+        current_routing = None
+        written = 0
+        unwritable = []
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                break
+            for transfer_id, ssn, direction, cents, routing_number, account_number, account_type, name in rows:
+                if routing_number is None:
+                    unwritable.append((transfer_id, ssn, direction, cents))
+                    continue
+                if routing_number != current_routing:
+                    if current_routing is not None:
+                        writer.end_batch()
+                    writer.begin_batch(now + timedelta(days=1))
+                    current_routing = routing_number
+                kind = 'SAVINGS' if str(account_type).upper() == 'SAVINGS' else 'CHECKING'
+                writer.entry(TRANSACTION_CODES[(direction, kind)], routing_number, account_number,
+                             cents, transfer_id, name)
+                written += 1
+
+        if current_routing is not None:
+            writer.end_batch()
+        writer.file_control()
+
+    return written, unwritable
+
+
+def fail_entries(conn, cursor, entries, code, chunk_size=5000):
+    """Mark entries FAILED with a reason code and refund withdrawals, one transaction per chunk"""
+    for start in range(0, len(entries), chunk_size):
+        chunk = entries[start:start + chunk_size]
+        deltas = {}
+        for _, ssn, direction, cents in chunk:
+            if direction == WITHDRAWAL:
+                deltas[ssn] = deltas.get(ssn, Decimal('0')) + Decimal(cents) / 100
+
+        try:
+            apply_balance_deltas(cursor, deltas)
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(f"""
+            UPDATE BANK_TRANSFER
+            SET Status = 'FAILED', Return_Code = %s, Date_Time_Settled = NOW()
+            WHERE Transfer_ID IN ({placeholders}) AND Status = 'BATCHED'
+            """, [code] + [entry[0] for entry in chunk])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+
+def read_entry_ids(path):
+    """Transfer_IDs of the entry records in a settlement file"""
+    with open(path) as f:
+        return {int(line[39:54]) for line in f if line.startswith('6')}
+
+
+def read_returns(path):
+    """Parse a return file into {Transfer_ID: return reason code}"""
+    returns = {}
+    transfer_id = None
+    with open(path) as f:
+        for line in f:
+            if line.startswith('6'):
+                transfer_id = int(line[39:54])
+            elif line.startswith('799') and transfer_id is not None:
+                returns[transfer_id] = line[3:6]
+                transfer_id = None
+    return returns
+
+
+def apply_settlement(conn, batch_id, batch_path, returns_path=None, chunk_size=5000):
+    """Settle a batch: credit top-ups, refund returned withdrawals, one transaction per chunk.
+
+    Only entries present in the batch's settlement file are settled; any other claimed entry
+    was never sent, so it goes back to PENDING for the next batch and is counted as requeued.
+    """
+    in_file = read_entry_ids(batch_path)
+    returns = read_returns(returns_path) if returns_path else {}
+    counts = {'settled': 0, 'returned': 0, 'requeued': 0}
+    last_id = 0
+
+    cursor = conn.cursor()
+    try:
+        while True:
+            cursor.execute("""
+            SELECT Transfer_ID, SSN, Direction, Amount_Cents
+            FROM BANK_TRANSFER
+            WHERE Batch_ID = %s AND Status = 'BATCHED' AND Transfer_ID > %s
+            ORDER BY Transfer_ID
+            LIMIT %s
+            FOR UPDATE
+            """, (batch_id, last_id, chunk_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            deltas = {}
+            settled = []
+            returned = []
+            requeued = []
+            for transfer_id, ssn, direction, cents in rows:
+                amount = Decimal(cents) / 100
+                if transfer_id not in in_file:
+                    requeued.append(transfer_id)
+                elif transfer_id in returns:
+                    returned.append((returns[transfer_id], transfer_id))
+                    # A returned withdrawal gives back the funds reserved when it was queued
+                    if direction == WITHDRAWAL:
+                        deltas[ssn] = deltas.get(ssn, Decimal('0')) + amount
+                else:
+                    settled.append(transfer_id)
+                    if direction == TOPUP:
+                        deltas[ssn] = deltas.get(ssn, Decimal('0')) + amount
+
+            try:
+                apply_balance_deltas(cursor, deltas)
+                if settled:
+                    placeholders = ', '.join(['%s'] * len(settled))
+                    cursor.execute(f"""
+                    UPDATE BANK_TRANSFER
+                    SET Status = 'SETTLED', Date_Time_Settled = NOW()
+                    WHERE Transfer_ID IN ({placeholders})
+                    """, settled)
+                if requeued:
+                    placeholders = ', '.join(['%s'] * len(requeued))
+                    cursor.execute(f"""
+                    UPDATE BANK_TRANSFER
+                    SET Status = 'PENDING', Batch_ID = NULL
+                    WHERE Transfer_ID IN ({placeholders})
+                    """, requeued)
+                if returned:
+                    cursor.executemany("""
+                    UPDATE BANK_TRANSFER
+                    SET Status = 'RETURNED', Return_Code = %s, Date_Time_Settled = NOW()
+                    WHERE Transfer_ID = %s
+                    """, returned)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+            counts['settled'] += len(settled)
+            counts['returned'] += len(returned)
+            counts['requeued'] += len(requeued)
+    finally:
+        cursor.close()
+
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batched bank top-up and withdrawal settlement")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('setup', help="Create the BANK_TRANSFER table")
+
+    batch_parser = subparsers.add_parser('batch', help="Batch pending entries into an ACH file")
+    batch_parser.add_argument('--out', default=os.getenv("ACH_OUTPUT_DIR", "settlement"))
+
+    apply_parser = subparsers.add_parser('apply', help="Settle a batch, applying a return file if given")
+    apply_parser.add_argument('--batch', required=True, help="Batch id, e.g. B20240101120000")
+    apply_parser.add_argument('--out', default=os.getenv("ACH_OUTPUT_DIR", "settlement"))
+    apply_parser.add_argument('--file', help="Settlement file of the batch (default: <out>/<batch>.ach)")
+    apply_parser.add_argument('--returns', help="Return file from the bank")
+    apply_parser.add_argument('--chunk-size', type=int, default=5000)
+
+    release_parser = subparsers.add_parser('release', help="Requeue a batch whose file was never completed")
+    release_parser.add_argument('--batch', required=True)
+    release_parser.add_argument('--out', default=os.getenv("ACH_OUTPUT_DIR", "settlement"))
+
+    args = parser.parse_args()
+
+    conn = WalletPaymentNetwork().connect_db()
+    if not conn:
+        return
+
+    try:
+        if args.command == 'setup':
+            setup(conn)
+            print("BANK_TRANSFER table created.")
+        elif args.command == 'batch':
+            path, written, failed = create_batch(conn, args.out)
+            if path:
+                print(f"Batched {written} entries into {path}")
+            elif not failed:
+                print("No pending bank transfers.")
+            if failed:
+                print(f"{failed} entries failed: their bank account no longer exists.")
+        elif args.command == 'apply':
+            batch_path = args.file or os.path.join(args.out, f"{args.batch}.ach")
+            if not os.path.exists(batch_path):
+                print(f"{batch_path} does not exist. If the batch run died before finishing it, "
+                      f"use 'release --batch {args.batch}' to requeue its entries.")
+                return
+            counts = apply_settlement(conn, args.batch, batch_path, args.returns, args.chunk_size)
+            print(f"Settled {counts['settled']} entries, {counts['returned']} returned.")
+            if counts['requeued']:
+                print(f"{counts['requeued']} batched entries were not in {batch_path} and were requeued.")
+        elif args.command == 'release':
+            # A completed file may already have been sent to the bank
+            if os.path.exists(os.path.join(args.out, f"{args.batch}.ach")):
+                print(f"{args.batch} has a completed settlement file; settle it with 'apply' instead.")
+                return
+            released = release_batch(conn, args.batch)
+            partial = os.path.join(args.out, f"{args.batch}.ach.tmp")
+            if os.path.exists(partial):
+                os.unlink(partial)
+            print(f"Released {released} entries back to the queue.")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
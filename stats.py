@@ -0,0 +1,194 @@
+import argparse
+import hashlib
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+
+from archive import month_bounds, month_range, parse_month
+from wallet import WalletPaymentNetwork, transaction_tables
+
+FETCH_SIZE = 20000
+
+
+class QuantileSketch:
+    """Mergeable log-bucketed quantile sketch with bounded relative error"""
+
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value):
+        self.count += 1
+        if value <= 0:
+            self.zero_count += 1
+            return
+        key = math.ceil(math.log(value) / self.log_gamma)
+        self.buckets[key] = self.buckets.get(key, 0) + 1
+
+    def merge(self, other):
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    def quantile(self, q):
+        """Estimate the q-th quantile, or None when the sketch is empty"""
+        if not self.count:
+            return None
+
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if rank < seen:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+
+class HyperLogLog:
+    """Mergeable distinct-count estimator"""
+
+    def __init__(self, precision=14):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(self.size)
+
+    def add(self, value):
+        digest = int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), 'big')
+        index = digest >> (64 - self.precision)
+        remainder = digest & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - remainder.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def estimate(self):
+        alpha = 0.7213 / (1 + 1.079 / self.size)
+        raw = alpha * self.size ** 2 / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        # Linear counting is more accurate while most registers are still empty
+        if raw <= 2.5 * self.size and zeros:
+            return round(self.size * math.log(self.size / zeros))
+        return round(raw)
+
+
+class MonthStats:
+    """Partial network statistics for one partition, mergeable with others"""
+
+    def __init__(self, label):
+        self.label = label
+        self.count = 0
+        self.total_cents = 0
+        self.amounts = QuantileSketch()
+        self.senders = HyperLogLog()
+        self.receivers = HyperLogLog()
+
+    def merge(self, other):
+        self.count += other.count
+        self.total_cents += other.total_cents
+        self.amounts.merge(other.amounts)
+        self.senders.merge(other.senders)
+        self.receivers.merge(other.receivers)
+
+    def summary(self):
+        return {
+            'label': self.label,
+            'count': self.count,
+            'total': self.total_cents / 100,
+            'mean': self.total_cents / 100 / self.count if self.count else 0.0,
+            'median': self.amounts.quantile(0.5) or 0.0,
+            'p95': self.amounts.quantile(0.95) or 0.0,
+            'p99': self.amounts.quantile(0.99) or 0.0,
+            'senders': self.senders.estimate(),
+            'receivers': self.receivers.estimate()
+        }
+
+
+def compute_month(month):
+    """Process pool worker: stream one month of transfers over its own connection"""
+    stats = MonthStats(month)
+    start, end = month_bounds(month)
+
+    conn = WalletPaymentNetwork().connect_db()
+    if not conn:
+        raise RuntimeError(f"Could not connect to the database for {month}")
+
+    cursor = conn.cursor()
+    try:
+        # Archived months live in the archive table, so read both
+        for table in transaction_tables(cursor):
+            query = f"""
+            SELECT Sender_SSN, Recipient_SSN, Amount
+            FROM {table}
+            WHERE Date_Time_Initiated >= %s AND Date_Time_Initiated < %s
+            AND Status = 'COMPLETED'
+            """
+            cursor.execute(query, (start, end))
+
+            while True:
+                rows = cursor.fetchmany(FETCH_SIZE)
+                if not rows:
+                    break
+                for sender_ssn, recipient_ssn, amount in rows:
+                    cents = int(Decimal(str(amount)) * 100)
+                    stats.count += 1
+                    stats.total_cents += cents
+                    stats.amounts.add(cents / 100)
+                    stats.senders.add(sender_ssn)
+                    stats.receivers.add(recipient_ssn)
+    finally:
+        cursor.close()
+        conn.close()
+
+    return stats
+
+
+def network_stats(first_month, last_month, workers=None):
+    """Compute every month in parallel and merge them into a range total"""
+    months = month_range(first_month, last_month)
+    overall = MonthStats(f"{first_month} to {last_month}")
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        monthly = list(pool.map(compute_month, months))
+
+    for stats in monthly:
+        overall.merge(stats)
+
+    return monthly, overall
+
+
+def print_summary(summary):
+    print(f"{summary['label']}: {summary['count']} transfers, total ${summary['total']:.2f}, "
+          f"mean ${summary['mean']:.2f}, median ${summary['median']:.2f}, "
+          f"p95 ${summary['p95']:.2f}, p99 ${summary['p99']:.2f}, "
+          f"~{summary['senders']} senders, ~{summary['receivers']} receivers")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Network-wide monthly transaction statistics")
+    parser.add_argument('--start', type=parse_month, required=True, help="First month (YYYY-MM)")
+    parser.add_argument('--end', type=parse_month, required=True, help="Last month (YYYY-MM)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Worker processes")
+    args = parser.parse_args()
+
+    monthly, overall = network_stats(args.start, args.end, args.workers)
+
+    print("\n--- Network Monthly Statistics ---")
+    for stats in monthly:
+        print_summary(stats.summary())
+    print()
+    print_summary(overall.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+from decimal import Decimal
+from unittest import mock
+
+from archive import TransactionArchive
+
+ALICE = '111-11-1111'
+BOB = '222-22-2222'
+CAROL = '333-33-3333'
+
+# (table, sender, recipient, amount, initiated); January has already been moved to the archive table
+TRANSFERS = [
+    ('SEND_TRANSACTION_ARCHIVE', ALICE, BOB, Decimal('10.00'), datetime(2024, 1, 3, 9, 0)),
+    ('SEND_TRANSACTION_ARCHIVE', ALICE, CAROL, Decimal('2.50'), datetime(2024, 1, 14, 12, 0)),
+    ('SEND_TRANSACTION_ARCHIVE', BOB, ALICE, Decimal('4.25'), datetime(2024, 1, 20, 18, 30)),
+    ('SEND_TRANSACTION_ARCHIVE', CAROL, BOB, Decimal('100.00'), datetime(2024, 1, 31, 23, 59, 59)),
+    ('SEND_TRANSACTION', BOB, CAROL, Decimal('7.77'), datetime(2024, 2, 1, 0, 0)),
+    ('SEND_TRANSACTION', ALICE, BOB, Decimal('0.01'), datetime(2024, 2, 10, 8, 0)),
+    ('SEND_TRANSACTION', CAROL, ALICE, Decimal('55.55'), datetime(2024, 2, 28, 17, 45)),
+]
+
+
+class FakeCursor:
+    """Answers transaction_tables and the per-month export query from TRANSFERS"""
+
+    def __init__(self):
+        self.rows = []
+
+    def execute(self, query, params=None):
+        if 'INFORMATION_SCHEMA' in query:
+            self.rows = [(1,)]
+            return
+        table = query.split('FROM')[1].split()[0]
+        start, end = params
+        self.rows = sorted(
+            ((sender, recipient, amount, initiated)
+             for t, sender, recipient, amount, initiated in TRANSFERS
+             if t == table and start <= initiated < end),
+            key=lambda row: row[3]
+        )
+
+    def fetchone(self):
+        return self.rows.pop(0) if self.rows else None
+
+    def fetchmany(self, size):
+        chunk, self.rows = self.rows[:size], self.rows[size:]
+        return chunk
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def cursor(self):
+        return FakeCursor()
+
+
+def cents(*amounts):
+    return int(sum(amounts) * 100)
+
+
+class TransactionArchiveTest(unittest.TestCase):
+    def setUp(self):
+        self.archive_dir = tempfile.mkdtemp()
+        self.archive = TransactionArchive(self.archive_dir)
+        # A small fetch size makes each month span several chunks
+        with mock.patch('archive.FETCH_SIZE', 2):
+            self.exported = [self.archive.export_month(FakeConnection(), month)
+                             for month in ('2024-01', '2024-02', '2024-03')]
+
+    def tearDown(self):
+        shutil.rmtree(self.archive_dir)
+
+    def test_export_writes_partitions_and_index(self):
+        self.assertEqual(self.exported, [4, 3, 0])
+
+        reopened = TransactionArchive(self.archive_dir)
+        january = reopened.index['2024-01']
+        self.assertEqual(january['rows'], 4)
+        self.assertEqual((january['min_amount_cents'], january['max_amount_cents']), (250, 10000))
+        self.assertEqual(january['max_timestamp'] - january['min_timestamp'], 28 * 86400 + 14 * 3600 + 59 * 60 + 59)
+        self.assertEqual(reopened.column('2024-02', 'amount_cents').tolist(), [777, 1, 5555])
+        self.assertEqual(reopened.column('2024-03', 'sender').tolist(), [])
+        # The empty month is indexed but never scanned
+        self.assertEqual(reopened.months(), ['2024-01', '2024-02'])
+
+    def test_monthly_totals(self):
+        self.assertEqual(self.archive.monthly_totals(), [
+            ('2024-01', 4, cents(Decimal('10.00'), Decimal('2.50'), Decimal('4.25'), Decimal('100.00'))),
+            ('2024-02', 3, cents(Decimal('7.77'), Decimal('0.01'), Decimal('55.55')))
+        ])
+
+    def test_user_flows(self):
+        self.assertEqual(self.archive.user_flows(ALICE), [
+            ('2024-01', 1250, 425, 3),
+            ('2024-02', 1, 5555, 2)
+        ])
+        self.assertEqual(self.archive.user_flows('999-99-9999'), [])
+
+    def test_top_users(self):
+        self.assertEqual(self.archive.top_users(), [
+            (CAROL, 15555, 2),
+            (ALICE, 1251, 3),
+            (BOB, 1202, 2)
+        ])
+        self.assertEqual(self.archive.top_users(limit=1, by='recipient'), [(BOB, 11001, 3)])
+
+    def test_partial_months_are_masked(self):
+        start, end = datetime(2024, 1, 14), datetime(2024, 2, 10, 8, 0)
+
+        self.assertIsNone(self.archive._window('2024-01', datetime(2024, 1, 1), datetime(2024, 2, 1)))
+        self.assertEqual(self.archive._window('2024-01', start, None).tolist(), [False, True, True, True])
+        self.assertEqual(self.archive._window('2024-02', None, end).tolist(), [True, False, False])
+
+        self.assertEqual(self.archive.monthly_totals(start, end), [('2024-01', 3, 10675), ('2024-02', 1, 777)])
+        self.assertEqual(self.archive.user_flows(ALICE, start, end), [('2024-01', 250, 425, 2)])
+        self.assertEqual(self.archive.top_users(start=start, end=end), [(CAROL, 10000, 1), (BOB, 1202, 2), (ALICE, 250, 1)])
+
+    def test_range_outside_the_archive_is_pruned(self):
+        self.assertEqual(self.archive.months(datetime(2024, 3, 1), datetime(2024, 4, 1)), [])
+        self.assertEqual(self.archive.monthly_totals(end=datetime(2024, 1, 1)), [])
+        self.assertEqual(self.archive.top_users(start=datetime(2024, 3, 1)), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
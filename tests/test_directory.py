@@ -0,0 +1,36 @@
+import unittest
+
+from directory import ContactDirectory
+
+
+def ssn(index):
+    return f"900-00-{index:04d}"
+
+
+class ContactDirectorySearchTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = ContactDirectory()
+        for i in range(1000):
+            self.directory.add('name', f"Alex {i:04d}", ssn(i), f"Alex {i:04d}")
+            self.directory.add('email', f"alex{i:04d}@example.com", ssn(i))
+
+    def test_frequent_payee_beyond_the_scan_window_is_suggested_first(self):
+        pay_counts = {ssn(999): 50, ssn(3): 1}
+
+        suggestions = self.directory.search('alex', pay_counts, scan_limit=500)
+
+        self.assertEqual(suggestions[0], (ssn(999), 'Alex 0999', 'alex0999@example.com'))
+        self.assertEqual(suggestions[1][0], ssn(3))
+        self.assertEqual(len(suggestions), 5)
+
+    def test_name_match_suggests_a_payable_contact(self):
+        self.assertEqual(self.directory.search('0042'), [(ssn(42), 'Alex 0042', 'alex0042@example.com')])
+
+    def test_removed_contact_is_not_suggested(self):
+        self.directory.remove('email', 'alex0007@example.com', ssn(7))
+
+        self.assertEqual(self.directory.search('alex0007@'), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+
+import numpy as np
+
+from archive import ssn_to_id
+from graph import PaymentGraph, aggregate, edge_keys
+
+
+def ssn(index):
+    return f"900-00-{index:04d}"
+
+
+def graph_from(transfers):
+    """Build a compacted graph from (sender, recipient, cents) index triples"""
+    src = np.array([ssn_to_id(ssn(s)) for s, _, _ in transfers], dtype=np.uint32)
+    dst = np.array([ssn_to_id(ssn(r)) for _, r, _ in transfers], dtype=np.uint32)
+    cents = np.array([c for _, _, c in transfers], dtype=np.int64)
+    return PaymentGraph.from_edges(*aggregate(edge_keys(src, dst), np.ones(len(transfers), np.uint32), cents))
+
+
+# 1 <-> 2 pay each other, 1 -> 3 -> 4 is a chain, 5 -> 6 is a separate component
+TRANSFERS = [
+    (1, 2, 500), (1, 2, 250), (2, 1, 300),
+    (1, 3, 100), (3, 4, 900),
+    (5, 6, 50)
+]
+
+
+class PaymentGraphTest(unittest.TestCase):
+    def setUp(self):
+        self.graph = graph_from(TRANSFERS)
+
+    def test_csr_aggregates_duplicate_edges(self):
+        self.assertEqual(len(self.graph.nodes), 6)
+        self.assertEqual(len(self.graph.indices), 5)
+        self.assertEqual(self.graph.indptr[-1], 5)
+
+        start, end = self.graph.indptr[self.graph.node(ssn(1))], self.graph.indptr[self.graph.node(ssn(1)) + 1]
+        neighbors = {int(self.graph.nodes[i]): (int(c), int(t)) for i, c, t in zip(
+            self.graph.indices[start:end], self.graph.counts[start:end], self.graph.cents[start:end])}
+        self.assertEqual(neighbors, {ssn_to_id(ssn(2)): (2, 750), ssn_to_id(ssn(3)): (1, 100)})
+
+    def test_top_counterparties_in_both_directions(self):
+        self.assertEqual(self.graph.top_counterparties(ssn(1)), [(ssn(2), 2, 750), (ssn(3), 1, 100)])
+        self.assertEqual(self.graph.top_counterparties(ssn(1), direction='in'), [(ssn(2), 1, 300)])
+        self.assertEqual(self.graph.top_counterparties(ssn(7)), [])
+
+    def test_connected_components(self):
+        labels, sizes = self.graph.connected_components()
+
+        self.assertEqual(sorted(sizes.tolist()), [2, 4])
+        same = labels[self.graph.node(ssn(1))] == labels[self.graph.node(ssn(4))]
+        separate = labels[self.graph.node(ssn(1))] != labels[self.graph.node(ssn(5))]
+        self.assertTrue(same and separate)
+
+    def test_reciprocal_pairs(self):
+        self.assertEqual(self.graph.reciprocal_pairs(), [(ssn(1), ssn(2), 750, 300)])
+
+    def test_k_hop(self):
+        self.assertEqual(self.graph.k_hop(ssn(1), 1), {ssn(1): 0, ssn(2): 1, ssn(3): 1})
+        self.assertEqual(self.graph.k_hop(ssn(1), 2), {ssn(1): 0, ssn(2): 1, ssn(3): 1, ssn(4): 2})
+        self.assertEqual(self.graph.k_hop(ssn(4), 2, direction='in'), {ssn(4): 0, ssn(3): 1, ssn(1): 2})
+
+
+class PendingEdgesTest(unittest.TestCase):
+    def test_pending_edges_answer_like_a_compacted_graph(self):
+        graph = graph_from(TRANSFERS)
+        graph.add_transfer(ssn(1), ssn(2), 1)
+        graph.add_transfer(ssn(4), ssn(7), 20)
+        expected = graph_from(TRANSFERS + [(1, 2, 100), (4, 7, 2000)])
+
+        self.assertTrue(graph.pending)
+        for user in (1, 2, 4, 7):
+            for direction in ('out', 'in'):
+                self.assertEqual(graph.top_counterparties(ssn(user), direction=direction),
+                                 expected.top_counterparties(ssn(user), direction=direction))
+                self.assertEqual(graph.k_hop(ssn(user), 3, direction), expected.k_hop(ssn(user), 3, direction))
+        # Per-user queries read pending edges without compacting
+        self.assertTrue(graph.pending)
+
+        graph.compact()
+        self.assertFalse(graph.pending)
+        for name in ('nodes', 'indptr', 'indices', 'counts', 'cents'):
+            np.testing.assert_array_equal(getattr(graph, name), getattr(expected, name))
+
+
+if __name__ == "__main__":
+    unittest.main()
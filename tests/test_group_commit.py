@@ -0,0 +1,68 @@
+import unittest
+from unittest import mock
+
+from group_commit import GroupCommitWriter
+
+
+class FakeCursor:
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+
+    def execute(self, query, params=None):
+        if self.fail_on and query.startswith(self.fail_on):
+            raise RuntimeError(f"{self.fail_on} failed")
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.fail_on = None
+
+    def cursor(self):
+        return FakeCursor(self.fail_on)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        pass
+
+
+class GroupCommitWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.conn = FakeConnection()
+        self.wallet = mock.Mock()
+        self.wallet.connect_db.return_value = self.conn
+        self.writer = GroupCommitWriter(self.wallet, window_ms=1)
+
+    def tearDown(self):
+        self.writer.close()
+
+    def test_post_commit_failure_still_resolves_the_transfer(self):
+        self.wallet._after_transfer_commit.side_effect = RuntimeError("cache update failed")
+
+        with mock.patch('builtins.print'):
+            self.assertTrue(self.writer.submit('111-11-1111', '222-22-2222', 5, "Lunch").result(timeout=5))
+            self.assertTrue(self.writer.submit('111-11-1111', '222-22-2222', 5, "Lunch").result(timeout=5))
+        self.assertTrue(self.writer.thread.is_alive())
+
+    def test_failed_batch_resolves_every_future_and_keeps_the_writer_running(self):
+        self.conn.fail_on = 'SAVEPOINT'
+        future = self.writer.submit('111-11-1111', '222-22-2222', 5, "Lunch")
+        with self.assertRaises(RuntimeError):
+            future.result(timeout=5)
+
+        self.conn.fail_on = None
+        self.assertTrue(self.writer.submit('111-11-1111', '222-22-2222', 5, "Lunch").result(timeout=5))
+
+
+if __name__ == "__main__":
+    unittest.main()
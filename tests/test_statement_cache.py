@@ -0,0 +1,75 @@
+import unittest
+from datetime import date, datetime, timedelta
+from unittest import mock
+
+from wallet import StatementCache
+
+ALICE = '111-11-1111'
+BOB = '222-22-2222'
+JANUARY = (date(2024, 1, 1), date(2024, 1, 31))
+FEBRUARY = (date(2024, 2, 1), date(2024, 2, 29))
+
+
+def statement(sent=0):
+    return {'total_sent': sent, 'total_received': 0, 'monthly': []}
+
+
+class StatementCacheTest(unittest.TestCase):
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = StatementCache(max_entries=2)
+        cache.put(ALICE, *JANUARY, statement(1))
+        cache.put(BOB, *JANUARY, statement(2))
+        # Reading Alice's entry makes Bob's the least recently used
+        cache.get(ALICE, *JANUARY)
+        cache.put(ALICE, *FEBRUARY, statement(3))
+
+        self.assertEqual(cache.get(ALICE, *JANUARY), statement(1))
+        self.assertIsNone(cache.get(BOB, *JANUARY))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_invalidation_only_drops_ranges_containing_the_transfer(self):
+        cache = StatementCache()
+        cache.put(ALICE, *JANUARY, statement(1))
+        cache.put(ALICE, *FEBRUARY, statement(2))
+        cache.put(BOB, *JANUARY, statement(3))
+
+        cache.invalidate(ALICE, datetime(2024, 1, 31, 23, 59))
+
+        self.assertIsNone(cache.get(ALICE, *JANUARY))
+        self.assertEqual(cache.get(ALICE, *FEBRUARY), statement(2))
+        self.assertEqual(cache.get(BOB, *JANUARY), statement(3))
+        self.assertEqual(cache.stats()['invalidations'], 1)
+
+    def test_closed_range_does_not_expire(self):
+        cache = StatementCache(open_range_ttl=300)
+        with mock.patch('wallet.time.monotonic', return_value=1000.0):
+            cache.put(ALICE, *JANUARY, statement(1))
+        with mock.patch('wallet.time.monotonic', return_value=1000.0 + 10 ** 6):
+            self.assertEqual(cache.get(ALICE, *JANUARY), statement(1))
+
+    def test_range_reaching_today_expires_after_the_ttl(self):
+        cache = StatementCache(open_range_ttl=300)
+        today = datetime.now().date()
+        start = today - timedelta(days=30)
+        with mock.patch('wallet.time.monotonic', return_value=1000.0):
+            cache.put(ALICE, start, today, statement(1))
+        with mock.patch('wallet.time.monotonic', return_value=1299.0):
+            self.assertEqual(cache.get(ALICE, start, today), statement(1))
+        with mock.patch('wallet.time.monotonic', return_value=1301.0):
+            self.assertIsNone(cache.get(ALICE, start, today))
+        self.assertEqual(cache.stats()['entries'], 0)
+
+    def test_stats_report_hit_rate_and_memory(self):
+        cache = StatementCache()
+        cache.put(ALICE, *JANUARY, statement(1))
+        cache.get(ALICE, *JANUARY)
+        cache.get(BOB, *JANUARY)
+
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        self.assertAlmostEqual(stats['hit_rate'], 0.5)
+        self.assertGreater(stats['memory_bytes'], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
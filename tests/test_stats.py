@@ -0,0 +1,105 @@
+import random
+import unittest
+
+from stats import HyperLogLog, MonthStats, QuantileSketch
+
+
+def ssn(index):
+    return f"900-{index // 10000:02d}-{index % 10000:04d}"
+
+
+def record(stats, sender, recipient, cents):
+    """Add one transfer the way compute_month does"""
+    stats.count += 1
+    stats.total_cents += cents
+    stats.amounts.add(cents / 100)
+    stats.senders.add(sender)
+    stats.receivers.add(recipient)
+
+
+class QuantileSketchTest(unittest.TestCase):
+    def test_quantiles_stay_within_the_relative_accuracy(self):
+        rng = random.Random(7)
+        values = [round(rng.lognormvariate(3, 1.5), 2) for _ in range(20000)]
+        sketch = QuantileSketch(relative_accuracy=0.01)
+        for value in values:
+            sketch.add(value)
+
+        values.sort()
+        for q in (0.0, 0.1, 0.5, 0.9, 0.95, 0.99, 1.0):
+            with self.subTest(q=q):
+                expected = values[int(q * (len(values) - 1))]
+                self.assertLessEqual(abs(sketch.quantile(q) - expected), 0.01 * expected + 1e-9)
+
+    def test_zero_amounts_and_empty_sketch(self):
+        sketch = QuantileSketch()
+        self.assertIsNone(sketch.quantile(0.5))
+
+        for value in (0, 0, 0, 5):
+            sketch.add(value)
+        self.assertEqual(sketch.quantile(0.5), 0.0)
+        self.assertAlmostEqual(sketch.quantile(1.0), 5, delta=0.05)
+
+    def test_merged_sketch_equals_a_single_pass(self):
+        rng = random.Random(11)
+        values = [rng.uniform(0, 500) for _ in range(5000)]
+        single, left, right = QuantileSketch(), QuantileSketch(), QuantileSketch()
+        for i, value in enumerate(values):
+            single.add(value)
+            (left if i % 3 else right).add(value)
+
+        left.merge(right)
+        self.assertEqual((left.buckets, left.zero_count, left.count),
+                         (single.buckets, single.zero_count, single.count))
+
+
+class HyperLogLogTest(unittest.TestCase):
+    def test_estimate_is_close_to_the_distinct_count(self):
+        for distinct in (100, 10000, 200000):
+            with self.subTest(distinct=distinct):
+                hll = HyperLogLog()
+                for i in range(distinct):
+                    hll.add(ssn(i))
+                    hll.add(ssn(i))
+                self.assertLessEqual(abs(hll.estimate() - distinct), 0.03 * distinct)
+
+    def test_merged_estimator_equals_a_single_pass(self):
+        single, left, right = HyperLogLog(), HyperLogLog(), HyperLogLog()
+        for i in range(30000):
+            single.add(ssn(i))
+            # The halves overlap, so the merge has to deduplicate
+            if i < 20000:
+                left.add(ssn(i))
+            if i >= 10000:
+                right.add(ssn(i))
+
+        left.merge(right)
+        self.assertEqual(left.registers, single.registers)
+
+
+class MonthStatsTest(unittest.TestCase):
+    def test_merged_months_summarize_like_a_single_pass(self):
+        rng = random.Random(3)
+        transfers = [(ssn(rng.randrange(500)), ssn(rng.randrange(500)), rng.randrange(1, 100000))
+                     for _ in range(3000)]
+        single = MonthStats("2024-01 to 2024-03")
+        overall = MonthStats("2024-01 to 2024-03")
+        for month in range(3):
+            partial = MonthStats(f"2024-0{month + 1}")
+            for sender, recipient, cents in transfers[month::3]:
+                record(partial, sender, recipient, cents)
+            overall.merge(partial)
+        for sender, recipient, cents in transfers:
+            record(single, sender, recipient, cents)
+
+        self.assertEqual(overall.summary(), single.summary())
+        self.assertEqual(overall.summary()['total'], sum(cents for _, _, cents in transfers) / 100)
+
+    def test_empty_month_summary(self):
+        summary = MonthStats("2024-01").summary()
+        self.assertEqual((summary['count'], summary['mean'], summary['median'], summary['senders']),
+                         (0, 0.0, 0.0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
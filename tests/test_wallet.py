@@ -0,0 +1,177 @@
+import unittest
+from decimal import Decimal
+from unittest import mock
+
+from directory import ContactDirectory
+from group_commit import GroupCommitWriter
+from wallet import WalletPaymentNetwork
+
+
+class FakeCursor:
+    """Records executed SQL and answers the few lookups the transfer path makes"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = 1
+        self.result = []
+
+    def execute(self, query, params=None):
+        query = ' '.join(query.split())
+        self.conn.executed.append((query, params))
+        self.rowcount = 1
+        if query.startswith('SELECT Recipient_SSN, COUNT(*)'):
+            self.result = []
+        elif query.startswith('SELECT EmailAddress, SSN FROM EMAIL_ADDRESS'):
+            # Like MySQL's default collation, match case-insensitively and return the stored value
+            wanted = {value.lower() for value in params}
+            self.result = [(value, ssn) for value, ssn in self.conn.owners.items() if value.lower() in wanted]
+        else:
+            self.result = []
+
+    def executemany(self, query, params):
+        self.conn.executed.append((' '.join(query.split()), list(params)))
+
+    def fetchall(self):
+        return self.result
+
+    def fetchone(self):
+        return self.result[0] if self.result else None
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, owners):
+        self.owners = owners
+        self.executed = []
+        self.commits = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class SendMoneyMultiTest(unittest.TestCase):
+    def setUp(self):
+        self.wallet = WalletPaymentNetwork()
+        self.wallet.current_user_ssn = '111-11-1111'
+        self.conn = FakeConnection({'a@example.com': '222-22-2222', 'b@example.com': '333-33-3333'})
+
+    def test_split_send_commits_once_and_notifies_each_recipient(self):
+        answers = iter(['a@example.com, b@example.com', '10.01', 'Dinner'])
+
+        with mock.patch.object(self.wallet, 'connect_db', return_value=self.conn), \
+                mock.patch.object(self.wallet, '_after_transfer_commit') as after_commit, \
+                mock.patch('builtins.input', lambda prompt='': next(answers)), \
+                mock.patch('builtins.print'):
+            self.wallet.send_money_multi()
+
+        self.assertEqual(self.conn.commits, 1)
+        after_commit.assert_has_calls([
+            mock.call('111-11-1111', '222-22-2222', Decimal('5.01')),
+            mock.call('111-11-1111', '333-33-3333', Decimal('5.00'))
+        ])
+
+        inserts = [params for query, params in self.conn.executed if query.startswith('INSERT INTO SEND_TRANSACTION')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual([row[1] for row in inserts[0]], ['222-22-2222', '333-33-3333'])
+
+    def test_recipients_match_regardless_of_case(self):
+        answers = iter(['A@Example.com, b@example.COM', '10.00', ''])
+
+        with mock.patch.object(self.wallet, 'connect_db', return_value=self.conn), \
+                mock.patch.object(self.wallet, '_after_transfer_commit'), \
+                mock.patch('builtins.input', lambda prompt='': next(answers)), \
+                mock.patch('builtins.print'):
+            self.wallet.send_money_multi()
+
+        self.assertEqual(self.conn.commits, 1)
+
+    def test_sub_cent_total_is_rejected(self):
+        answers = iter(['a@example.com, b@example.com', '10.005'])
+
+        with mock.patch.object(self.wallet, 'connect_db', return_value=self.conn), \
+                mock.patch('builtins.input', lambda prompt='': next(answers)), \
+                mock.patch('builtins.print') as printed:
+            self.wallet.send_money_multi()
+
+        printed.assert_called_with("Invalid amount entered.")
+        self.assertEqual(self.conn.commits, 0)
+        self.assertFalse([query for query, _ in self.conn.executed if query.startswith('INSERT')])
+
+
+class SendMoneyGroupCommitTest(unittest.TestCase):
+    def setUp(self):
+        self.wallet = WalletPaymentNetwork()
+        self.wallet.current_user_ssn = '111-11-1111'
+        self.conn = FakeConnection({'a@example.com': '222-22-2222'})
+        # The writer gets its own wallet whose database is down
+        writer_wallet = mock.Mock()
+        writer_wallet.connect_db.return_value = None
+        self.writer = GroupCommitWriter(writer_wallet, window_ms=1)
+
+    def tearDown(self):
+        self.writer.close()
+
+    def test_writer_failure_is_reported_not_raised(self):
+        answers = iter(['a@example.com', '5', 'Lunch'])
+
+        with mock.patch.object(self.wallet, 'connect_db', return_value=self.conn), \
+                mock.patch.object(self.wallet, '_group_commit', return_value=self.writer), \
+                mock.patch.object(self.wallet, '_after_transfer_commit') as after_commit, \
+                mock.patch('builtins.input', lambda prompt='': next(answers)), \
+                mock.patch('builtins.print') as printed:
+            self.wallet.send_money()
+
+        self.assertEqual(printed.call_args[0][0], "Transaction failed:")
+        self.assertIn("Database connection unavailable", str(printed.call_args[0][1]))
+        after_commit.assert_not_called()
+
+
+class ParseAmountTest(unittest.TestCase):
+    def test_whole_cents_are_accepted(self):
+        wallet = WalletPaymentNetwork()
+        self.assertEqual(wallet._parse_amount(' 12.50 '), Decimal('12.50'))
+        self.assertEqual(wallet._parse_amount('3'), Decimal('3'))
+
+    def test_sub_cent_and_non_finite_amounts_are_rejected(self):
+        wallet = WalletPaymentNetwork()
+        for text in ('1.005', 'inf', '-Infinity', 'nan'):
+            with self.subTest(text=text), self.assertRaises(ValueError):
+                wallet._parse_amount(text)
+
+
+class PickRecipientTest(unittest.TestCase):
+    def setUp(self):
+        self.wallet = WalletPaymentNetwork()
+        self.wallet.current_user_ssn = '111-11-1111'
+        self.wallet.contact_directory = ContactDirectory()
+        self.wallet.contact_directory.add('name', 'Alex Smith', '222-22-2222', 'Alex Smith')
+        self.wallet.contact_directory.add('email', 'alex@example.com', '222-22-2222')
+
+    def pick(self, conn, answers):
+        answers = iter(answers)
+        with mock.patch('builtins.input', lambda prompt='': next(answers)), mock.patch('builtins.print'):
+            return self.wallet._pick_recipient(conn.cursor(), "Recipient: ")
+
+    def test_name_suggestion_resolves_through_database(self):
+        conn = FakeConnection({'alex@example.com': '222-22-2222'})
+        self.assertEqual(self.pick(conn, ['smith', '1']), ('alex@example.com', '222-22-2222'))
+
+    def test_stale_suggestion_is_not_trusted(self):
+        # The email was removed from the database after the directory was built
+        conn = FakeConnection({})
+        self.assertEqual(self.pick(conn, ['alex', '1']), ('alex@example.com', None))
+
+
+if __name__ == "__main__":
+    unittest.main()
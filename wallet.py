@@ -1,15 +1,26 @@
 import getpass
+import logging
+import random
 import re
+import sys
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
 
 import mysql.connector
 import psycopg2
-from mysql.connector import Error
+from mysql.connector import Error, errorcode
 from dotenv import load_dotenv
 import os
 
+from directory import ContactDirectory
+from group_commit import GroupCommitWriter
+
 load_dotenv()
 
+log = logging.getLogger("wallet")
+
 # Access variables
 db_host = os.getenv("DB_HOST")
 db_name = os.getenv("DB_NAME")
@@ -17,6 +28,159 @@ db_user = os.getenv("DB_USER")
 db_password = os.getenv("DB_PASSWORD")
 db_port = os.getenv("DB_PORT")
 
+# Contact directory snapshot used for warm starts, rebuilt once older than the max age.
+# It holds contact details, so it lives in the user's cache directory rather than the cwd.
+CONTACT_DIRECTORY_SNAPSHOT = os.getenv("CONTACT_DIRECTORY_SNAPSHOT", os.path.join(
+    os.getenv("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "wallet", "contacts.snapshot.json"))
+CONTACT_DIRECTORY_MAX_AGE = int(os.getenv("CONTACT_DIRECTORY_MAX_AGE", 3600))
+
+# Opt-in group commit for send_money: batching window in milliseconds (0 disables it)
+GROUP_COMMIT_WINDOW_MS = float(os.getenv("GROUP_COMMIT_WINDOW_MS", 0))
+GROUP_COMMIT_MAX_BATCH = int(os.getenv("GROUP_COMMIT_MAX_BATCH", 100))
+
+# Days searched for recent transactions before falling back to the full history
+RECENT_WINDOW_DAYS = 90
+
+# Archived partitions of a transaction table are moved to <table><ARCHIVE_SUFFIX>
+ARCHIVE_SUFFIX = "_ARCHIVE"
+
+# Seconds between reloads of the hot-account list
+HOT_ACCOUNT_REFRESH = 60
+
+# Credits a slot only while the account is still hot; the join makes a stale cached hot list
+# harmless, since no row is written once HOT_ACCOUNT no longer lists the SSN
+CREDIT_SLOT_QUERY = """
+INSERT INTO BALANCE_SLOT (SSN, Slot, Balance)
+SELECT SSN, %s, %s FROM HOT_ACCOUNT WHERE SSN = %s AND Slots > %s
+ON DUPLICATE KEY UPDATE Balance = Balance + %s
+"""
+
+
+def transaction_tables(cursor, table='SEND_TRANSACTION'):
+    """The live table plus its archive table once partitions have been archived into it"""
+    cursor.execute("""
+    SELECT COUNT(*) 
+    FROM INFORMATION_SCHEMA.TABLES 
+    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+    """, (f"{table}{ARCHIVE_SUFFIX}",))
+    if cursor.fetchone()[0]:
+        return [table, f"{table}{ARCHIVE_SUFFIX}"]
+    return [table]
+
+
+def apply_balance_deltas(cursor, deltas):
+    """Apply {SSN: delta} to WALLET_ACCOUNT in one set-based UPDATE"""
+    deltas = {ssn: delta for ssn, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    cases = ' '.join(['WHEN %s THEN %s'] * len(deltas))
+    placeholders = ', '.join(['%s'] * len(deltas))
+    update_balances_query = f"""
+    UPDATE WALLET_ACCOUNT 
+    SET Balance = Balance + CASE SSN {cases} END 
+    WHERE SSN IN ({placeholders})
+    """
+    params = [value for item in deltas.items() for value in item] + list(deltas)
+    cursor.execute(update_balances_query, params)
+
+
+def fold_slots(cursor, ssn):
+    """Move a hot account's slot balances into its main row; returns the amount moved"""
+    # Lock the main row before the slots, the same order a debit takes them in
+    cursor.execute("SELECT Balance FROM WALLET_ACCOUNT WHERE SSN = %s FOR UPDATE", (ssn,))
+    cursor.fetchall()
+    cursor.execute("SELECT COALESCE(SUM(Balance), 0) FROM BALANCE_SLOT WHERE SSN = %s FOR UPDATE", (ssn,))
+    folded = cursor.fetchone()[0]
+
+    if folded:
+        cursor.execute("UPDATE WALLET_ACCOUNT SET Balance = Balance + %s WHERE SSN = %s", (folded, ssn))
+        cursor.execute("UPDATE BALANCE_SLOT SET Balance = 0 WHERE SSN = %s", (ssn,))
+    return folded
+
+
+class InsufficientFundsError(Exception):
+    """Raised when a debit would take a balance below zero"""
+
+class StatementCache:
+    """Size-bounded LRU cache of statement results keyed by (SSN, start, end)"""
+
+    def __init__(self, max_entries=256, open_range_ttl=300):
+        self.max_entries = max_entries
+        self.open_range_ttl = open_range_ttl
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, ssn, start, end):
+        """Return the cached statement or None"""
+        key = (ssn, start, end)
+        entry = self.entries.get(key)
+
+        if entry is not None:
+            statement, expires_at = entry
+            if expires_at is None or expires_at > time.monotonic():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return statement
+            del self.entries[key]
+
+        self.misses += 1
+        return None
+
+    def put(self, ssn, start, end, statement):
+        """Store a statement, evicting the least recently used entry when full"""
+        # A closed historical range can no longer gain transfers, so it is kept until
+        # evicted. A range that reaches today can also change through other sessions,
+        # so it only lives for the TTL on top of the send_money invalidation.
+        if end < datetime.now().date():
+            expires_at = None
+        else:
+            expires_at = time.monotonic() + self.open_range_ttl
+
+        key = (ssn, start, end)
+        self.entries[key] = (statement, expires_at)
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, ssn, timestamp):
+        """Drop entries for this SSN whose range contains the transfer timestamp"""
+        day = timestamp.date()
+        stale = [key for key in self.entries if key[0] == ssn and key[1] <= day <= key[2]]
+        for key in stale:
+            del self.entries[key]
+        self.invalidations += len(stale)
+
+    def memory_bytes(self):
+        """Approximate memory held by the cached keys and statements"""
+        total = sys.getsizeof(self.entries)
+        for key, (statement, _) in self.entries.items():
+            total += sys.getsizeof(key) + sum(sys.getsizeof(part) for part in key)
+            total += sys.getsizeof(statement)
+            total += sys.getsizeof(statement['total_sent']) + sys.getsizeof(statement['total_received'])
+            total += sys.getsizeof(statement['monthly'])
+            for row in statement['monthly']:
+                total += sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
+        return total
+
+    def stats(self):
+        """Hit rate and memory use report"""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'memory_bytes': self.memory_bytes()
+        }
+
 class WalletPaymentNetwork:
     def __init__(self):
         # Database connection parameters 
@@ -29,6 +193,15 @@ class WalletPaymentNetwork:
             'port': db_port
         }
         self.current_user_ssn = None
+        self.statement_cache = StatementCache(
+            max_entries=int(os.getenv("STATEMENT_CACHE_SIZE", 256)),
+            open_range_ttl=int(os.getenv("STATEMENT_CACHE_TTL", 300))
+        )
+        self.hot_accounts = None
+        self.hot_accounts_loaded = 0
+        self.contact_directory = None
+        self.pay_counts = None
+        self.group_commit = None
 
     def connect_db(self):
         """Establish database connection"""
@@ -157,6 +330,10 @@ class WalletPaymentNetwork:
             cursor.execute(insert_phone_query, (ssn, phone, True, False))
 
             conn.commit()
+            if self.contact_directory is not None:
+                self.contact_directory.add('name', name, ssn, name)
+                self.contact_directory.add('email', email, ssn)
+                self.contact_directory.add('phone', phone, ssn)
             print("Account registered successfully. Awaiting confirmation.")
 
         except psycopg2.Error as e:
@@ -178,63 +355,354 @@ class WalletPaymentNetwork:
             cursor = conn.cursor()
 
             # Get recipient details
-            recipient_id = input("Enter recipient's email or phone: ")
+            recipient_id, recipient_ssn = self._pick_recipient(cursor, "Enter recipient's email, phone or name: ")
+            if not recipient_id:
+                return
             amount = float(input("Enter amount to send: "))
-
-            # Find recipient's SSN
-            find_recipient_query = """
-            SELECT wa.SSN 
-            FROM WALLET_ACCOUNT wa
-            LEFT JOIN EMAIL_ADDRESS ea ON wa.SSN = ea.SSN
-            LEFT JOIN PHONE p ON wa.SSN = p.SSN
-            WHERE ea.EmailAddress = %s OR p.PhoneNumber = %s
-            """
-            cursor.execute(find_recipient_query, (recipient_id, recipient_id))
-            recipient_ssn = cursor.fetchone()
+            if amount <= 0:
+                print("Invalid amount entered.")
+                return
 
             if not recipient_ssn:
                 print("Recipient not found.")
                 return
 
-            recipient_ssn = recipient_ssn[0]
-
-            # Create send transaction
-            insert_transaction_query = """
-            INSERT INTO SEND_TRANSACTION 
-            (Sender_SSN, Recipient_SSN, Amount, Memo, Status) 
-            VALUES (%s, %s, %s, %s, %s)
-            """
+            # Create send transaction and update balances
             memo = input("Enter transaction memo (optional): ")
-            cursor.execute(insert_transaction_query, (
-                self.current_user_ssn, 
-                recipient_ssn, 
-                amount, 
-                memo or "Transfer", 
-                'COMPLETED'
-            ))
+            group_commit = self._group_commit()
+            if group_commit is not None:
+                # The writer commits the transfer with others queued in the same window
+                group_commit.submit(self.current_user_ssn, recipient_ssn, amount, memo or "Transfer").result()
+            else:
+                self._apply_transfer(cursor, self.current_user_ssn, recipient_ssn, amount, memo or "Transfer")
+                conn.commit()
+                self._after_transfer_commit(self.current_user_ssn, recipient_ssn, amount)
+            print(f"Successfully sent ${amount} to {recipient_id}")
 
-            # Update balances
-            update_sender_balance = """
-            UPDATE WALLET_ACCOUNT 
-            SET Balance = Balance - %s 
-            WHERE SSN = %s
-            """
-            cursor.execute(update_sender_balance, (amount, self.current_user_ssn))
+        except Error as e:
+            conn.rollback()
+            print("Transaction failed:", e)
+        except InsufficientFundsError:
+            conn.rollback()
+            print("Insufficient balance.")
+        except ValueError:
+            print("Invalid amount entered.")
+        finally:
+            if conn:
+                cursor.close()
+                conn.close()
 
-            update_recipient_balance = """
-            UPDATE WALLET_ACCOUNT 
-            SET Balance = Balance + %s 
-            WHERE SSN = %s
+    def _contact_directory(self, cursor):
+        """Prefix index of contacts, warm-started from its snapshot when one is fresh"""
+        if self.contact_directory is None:
+            self.contact_directory = ContactDirectory.load(CONTACT_DIRECTORY_SNAPSHOT, CONTACT_DIRECTORY_MAX_AGE)
+            if self.contact_directory is None:
+                self.contact_directory = ContactDirectory.build(cursor)
+                self.save_contact_directory()
+        return self.contact_directory
+
+    def save_contact_directory(self):
+        """Write the contact directory snapshot for the next warm start"""
+        if self.contact_directory is None:
+            return
+        try:
+            self.contact_directory.save(CONTACT_DIRECTORY_SNAPSHOT)
+        except OSError as e:
+            print("Could not save contact directory snapshot:", e)
+
+    def _pay_counts(self, cursor):
+        """How many times the current user has paid each recipient"""
+        if self.pay_counts is None or self.pay_counts[0] != self.current_user_ssn:
+            pay_counts_query = """
+            SELECT Recipient_SSN, COUNT(*) 
+            FROM SEND_TRANSACTION 
+            WHERE Sender_SSN = %s 
+            GROUP BY Recipient_SSN
             """
-            cursor.execute(update_recipient_balance, (amount, recipient_ssn))
+            cursor.execute(pay_counts_query, (self.current_user_ssn,))
+            self.pay_counts = (self.current_user_ssn, dict(cursor.fetchall()))
+        return self.pay_counts[1]
+
+    def _pick_recipient(self, cursor, prompt):
+        """Read a recipient, suggesting contacts when the entry is not an exact email or phone.
+
+        Returns (identifier, SSN). Suggestions come from the in-process directory, which may be
+        stale, so the SSN is always resolved against the database and is None if not found.
+        """
+        recipient_id = input(prompt).strip()
+        if not recipient_id:
+            return None, None
+
+        recipient_ssn = self._resolve_recipients(cursor, [recipient_id]).get(recipient_id)
+        if recipient_ssn:
+            return recipient_id, recipient_ssn
+
+        directory = self._contact_directory(cursor)
+        suggestions = [
+            suggestion for suggestion in directory.search(recipient_id, self._pay_counts(cursor))
+            if suggestion[0] != self.current_user_ssn
+        ]
+        if not suggestions:
+            return recipient_id, None
+
+        print("Did you mean:")
+        for i, (_, name, value) in enumerate(suggestions, 1):
+            print(f"{i}. {name} ({value})")
+
+        choice = input("Enter the number of the contact (or press Enter to use what you typed): ")
+        try:
+            recipient_id = suggestions[int(choice) - 1][2]
+        except (ValueError, IndexError):
+            return recipient_id, None
+        return recipient_id, self._resolve_recipients(cursor, [recipient_id]).get(recipient_id)
+
+    def _resolve_recipients(self, cursor, identifiers):
+        """Map each email or phone, as typed, to its owner's SSN with a single query"""
+        identifiers = list(dict.fromkeys(identifiers))
+        if not identifiers:
+            return {}
+
+        placeholders = ', '.join(['%s'] * len(identifiers))
+        find_recipients_query = f"""
+        SELECT EmailAddress, SSN FROM EMAIL_ADDRESS WHERE EmailAddress IN ({placeholders})
+        UNION ALL
+        SELECT PhoneNumber, SSN FROM PHONE WHERE PhoneNumber IN ({placeholders})
+        """
+        cursor.execute(find_recipients_query, identifiers + identifiers)
+        # The column collation matches case-insensitively, so map rows back the same way
+        owners = {value.lower(): ssn for value, ssn in cursor.fetchall()}
+        return {
+            identifier: owners[identifier.lower()]
+            for identifier in identifiers if identifier.lower() in owners
+        }
+
+    def _group_commit(self):
+        """Shared group-commit writer when GROUP_COMMIT_WINDOW_MS is set, otherwise None"""
+        if self.group_commit is None and GROUP_COMMIT_WINDOW_MS > 0:
+            self.group_commit = GroupCommitWriter(self, GROUP_COMMIT_WINDOW_MS, GROUP_COMMIT_MAX_BATCH)
+        return self.group_commit
+
+    def _apply_transfer(self, cursor, sender_ssn, recipient_ssn, amount, memo):
+        """Record one completed transfer and move the balance, inside the caller's transaction"""
+        insert_transaction_query = """
+        INSERT INTO SEND_TRANSACTION 
+        (Sender_SSN, Recipient_SSN, Amount, Memo, Status) 
+        VALUES (%s, %s, %s, %s, %s)
+        """
+        cursor.execute(insert_transaction_query, (
+            sender_ssn, 
+            recipient_ssn, 
+            amount, 
+            memo, 
+            'COMPLETED'
+        ))
+
+        self._debit(cursor, sender_ssn, amount)
+        self._credit(cursor, recipient_ssn, amount)
+
+    def _apply_transfers(self, cursor, sender_ssn, transfers):
+        """Record many transfers from one sender with one INSERT batch and set-based balance updates"""
+        insert_transaction_query = """
+        INSERT INTO SEND_TRANSACTION 
+        (Sender_SSN, Recipient_SSN, Amount, Memo, Status) 
+        VALUES (%s, %s, %s, %s, %s)
+        """
+        cursor.executemany(insert_transaction_query, [
+            (sender_ssn, recipient_ssn, amount, memo, 'COMPLETED')
+            for recipient_ssn, amount, memo in transfers
+        ])
+
+        self._debit(cursor, sender_ssn, sum(amount for _, amount, _ in transfers))
+
+        # Hot accounts take their credit in a balance slot, everyone else in one UPDATE
+        hot_accounts = self._hot_accounts(cursor)
+        deltas = {}
+        for recipient_ssn, amount, _ in transfers:
+            if recipient_ssn in hot_accounts:
+                self._credit(cursor, recipient_ssn, amount)
+            else:
+                deltas[recipient_ssn] = deltas.get(recipient_ssn, Decimal('0')) + amount
+        apply_balance_deltas(cursor, deltas)
+
+    def _hot_accounts(self, cursor):
+        """Return {SSN: slot count} for accounts in hot-account mode, refreshed every minute"""
+        if self.hot_accounts is None or time.monotonic() - self.hot_accounts_loaded > HOT_ACCOUNT_REFRESH:
+            try:
+                cursor.execute("SELECT SSN, Slots FROM HOT_ACCOUNT")
+                self.hot_accounts = dict(cursor.fetchall())
+            except Error:
+                # Hot-account tables are not installed
+                self.hot_accounts = {}
+            self.hot_accounts_loaded = time.monotonic()
+        return self.hot_accounts
+
+    def _credit(self, cursor, ssn, amount):
+        """Add to a balance; hot accounts spread credits over their slot rows"""
+        hot_accounts = self._hot_accounts(cursor)
+        if ssn in hot_accounts:
+            slot = random.randrange(hot_accounts[ssn])
+            cursor.execute(CREDIT_SLOT_QUERY, (slot, amount, ssn, slot, amount))
+            if cursor.rowcount:
+                return
+            # Disabled (or shrunk) since the hot list was loaded; reload it next time
+            self.hot_accounts = None
+
+        update_recipient_balance = """
+        UPDATE WALLET_ACCOUNT 
+        SET Balance = Balance + %s 
+        WHERE SSN = %s
+        """
+        cursor.execute(update_recipient_balance, (amount, ssn))
+
+    def _debit(self, cursor, ssn, amount):
+        """Take from a balance, raising InsufficientFundsError rather than going negative"""
+        update_sender_balance = """
+        UPDATE WALLET_ACCOUNT 
+        SET Balance = Balance - %s 
+        WHERE SSN = %s AND Balance >= %s
+        """
+        cursor.execute(update_sender_balance, (amount, ssn, amount))
+        if cursor.rowcount:
+            return
+
+        # Credits to a hot account may still sit in its slots; fold them in and retry
+        if ssn in self._hot_accounts(cursor) and fold_slots(cursor, ssn):
+            cursor.execute(update_sender_balance, (amount, ssn, amount))
+            if cursor.rowcount:
+                return
+
+        raise InsufficientFundsError(f"Insufficient balance for {ssn}")
+
+    def _slot_balance(self, cursor, ssn):
+        """Credits not yet folded into a hot account's main balance"""
+        if ssn not in self._hot_accounts(cursor):
+            return 0
+        cursor.execute("SELECT COALESCE(SUM(Balance), 0) FROM BALANCE_SLOT WHERE SSN = %s", (ssn,))
+        return cursor.fetchone()[0]
+
+    def split_bill(self):
+        """Split-bill menu for multi-recipient and multi-payer transfers"""
+        print("\n--- Split Bill ---")
+        print("1. Send to Multiple Recipients")
+        print("2. Request from Multiple Payers")
+        print("3. Return to Main Menu")
+
+        choice = input("Enter your choice: ")
+
+        if choice == '1':
+            self.send_money_multi()
+        elif choice == '2':
+            self.request_money_multi()
+        elif choice != '3':
+            print("Invalid choice. Try again.")
+
+    def _parse_amount(self, text):
+        """Parse a dollar amount, rejecting non-finite values and fractions of a cent"""
+        amount = Decimal(text.strip())
+        # Sub-cent amounts would otherwise be truncated silently
+        if not amount.is_finite() or amount != amount.quantize(Decimal('0.01')):
+            raise ValueError("Amounts must be finite and in whole cents")
+        return amount
+
+    def _collect_split(self, prompt):
+        """Read recipients and amounts for a split: an even split of a total or one amount each"""
+        identifiers = [value.strip() for value in input(prompt).split(',') if value.strip()]
+        if not identifiers:
+            return []
+
+        total = input("Enter total amount to split evenly (leave blank to enter each amount): ")
+        if total:
+            cents = int(self._parse_amount(total) * 100)
+            share, remainder = divmod(cents, len(identifiers))
+            # Leftover cents go to the first entries so the shares add up to the total
+            amounts = [Decimal(share + (1 if i < remainder else 0)) / 100 for i in range(len(identifiers))]
+        else:
+            amounts = [self._parse_amount(input(f"Amount for {identifier}: ")) for identifier in identifiers]
+
+        if any(amount <= 0 for amount in amounts):
+            raise ValueError("Amounts must be positive")
+        return list(zip(identifiers, amounts))
+
+    def send_money_multi(self):
+        """Send money to several wallet users in one atomic transaction"""
+        if not self.current_user_ssn:
+            print("Please log in first.")
+            return
+
+        try:
+            conn = self.connect_db()
+            cursor = conn.cursor()
+
+            split = self._collect_split("Enter recipients' emails or phones (comma separated): ")
+            if not split:
+                return
+            memo = input("Enter transaction memo (optional): ") or "Split Payment"
+
+            recipients = self._resolve_recipients(cursor, [identifier for identifier, _ in split])
+            missing = [identifier for identifier, _ in split if identifier not in recipients]
+            if missing:
+                print("Recipients not found:", ', '.join(missing))
+                return
+
+            transfers = [(recipients[identifier], amount, memo) for identifier, amount in split]
+            self._apply_transfers(cursor, self.current_user_ssn, transfers)
 
             conn.commit()
-            print(f"Successfully sent ${amount} to {recipient_id}")
+            for recipient_ssn, amount, _ in transfers:
+                self._after_transfer_commit(self.current_user_ssn, recipient_ssn, amount)
+            print(f"Successfully sent ${sum(amount for _, amount in split):.2f} to {len(split)} recipients")
 
-        except psycopg2.Error as e:
+        except Error as e:
             conn.rollback()
             print("Transaction failed:", e)
-        except ValueError:
+        except InsufficientFundsError:
+            conn.rollback()
+            print("Insufficient balance.")
+        except (ValueError, InvalidOperation):
+            print("Invalid amount entered.")
+        finally:
+            if conn:
+                cursor.close()
+                conn.close()
+
+    def request_money_multi(self):
+        """Request money from several wallet users at once"""
+        if not self.current_user_ssn:
+            print("Please log in first.")
+            return
+
+        try:
+            conn = self.connect_db()
+            cursor = conn.cursor()
+
+            split = self._collect_split("Enter payers' emails or phones (comma separated): ")
+            if not split:
+                return
+            memo = input("Enter request memo (optional): ") or "Split Request"
+
+            payers = self._resolve_recipients(cursor, [identifier for identifier, _ in split])
+            missing = [identifier for identifier, _ in split if identifier not in payers]
+            if missing:
+                print("Payers not found:", ', '.join(missing))
+                return
+
+            insert_request_query = """
+            INSERT INTO REQUEST_TRANSACTION 
+            (Sender_SSN, Recipient_SSN, Amount, Memo, Status) 
+            VALUES (%s, %s, %s, %s, %s)
+            """
+            cursor.executemany(insert_request_query, [
+                (payers[identifier], self.current_user_ssn, amount, memo, 'PENDING')
+                for identifier, amount in split
+            ])
+
+            conn.commit()
+            print(f"Requests for ${sum(amount for _, amount in split):.2f} sent to {len(split)} payers")
+
+        except Error as e:
+            conn.rollback()
+            print("Request failed:", e)
+        except (ValueError, InvalidOperation):
             print("Invalid amount entered.")
         finally:
             if conn:
@@ -252,26 +720,18 @@ class WalletPaymentNetwork:
             cursor = conn.cursor()
 
             # Get recipient details
-            recipient_id = input("Enter recipient's email or phone: ")
+            recipient_id, recipient_ssn = self._pick_recipient(cursor, "Enter recipient's email, phone or name: ")
+            if not recipient_id:
+                return
             amount = float(input("Enter amount to request: "))
-
-            # Find recipient's SSN
-            find_recipient_query = """
-            SELECT wa.SSN 
-            FROM WALLET_ACCOUNT wa
-            LEFT JOIN EMAIL_ADDRESS ea ON wa.SSN = ea.SSN
-            LEFT JOIN PHONE p ON wa.SSN = p.SSN
-            WHERE ea.EmailAddress = %s OR p.PhoneNumber = %s
-            """
-            cursor.execute(find_recipient_query, (recipient_id, recipient_id))
-            recipient_ssn = cursor.fetchone()
+            if amount <= 0:
+                print("Invalid amount entered.")
+                return
 
             if not recipient_ssn:
                 print("Recipient not found.")
                 return
 
-            recipient_ssn = recipient_ssn[0]
-
             # Create request transaction
             insert_request_query = """
             INSERT INTO REQUEST_TRANSACTION 
@@ -290,7 +750,7 @@ class WalletPaymentNetwork:
             conn.commit()
             print(f"Request for ${amount} sent to {recipient_id}")
 
-        except psycopg2.Error as e:
+        except Error as e:
             conn.rollback()
             print("Request failed:", e)
         except ValueError:
@@ -306,68 +766,146 @@ class WalletPaymentNetwork:
             print("Please log in first.")
             return
 
+        # Get date range
+        start_date = input("Enter start date (YYYY-MM-DD): ")
+        end_date = input("Enter end date (YYYY-MM-DD): ")
+
         try:
-            conn = self.connect_db()
-            cursor = conn.cursor()
+            start = datetime.strptime(start_date, '%Y-%m-%d').date()
+            end = datetime.strptime(end_date, '%Y-%m-%d').date()
+        except ValueError:
+            print("Invalid date format. Please use YYYY-MM-DD.")
+            return
+
+        statement = self.statement_cache.get(self.current_user_ssn, start, end)
 
-            # Get date range
-            start_date = input("Enter start date (YYYY-MM-DD): ")
-            end_date = input("Enter end date (YYYY-MM-DD): ")
+        if statement is None:
+            conn = self.connect_db()
+            if not conn:
+                return
 
-            start_date_formatted = f"{start_date} 00:00:00"
-            end_date_formatted = f"{end_date} 23:59:59"
+            cursor = conn.cursor()
+            try:
+                statement = self._fetch_statement(cursor, self.current_user_ssn, start, end)
+                self.statement_cache.put(self.current_user_ssn, start, end, statement)
+            except Error as e:
+                print("Statement retrieval failed:", e)
+                return
+            finally:
+                cursor.close()
+                conn.close()
 
+        print("\n--- Transaction Statement ---")
+        print(f"Period: {start_date} to {end_date}")
+        print(f"Total Amount Sent: ${statement['total_sent']:.2f}")
+        print(f"Total Amount Received: ${statement['total_received']:.2f}")
+
+        print("\nMonthly Breakdown:")
+        for year, month, sent, received in statement['monthly']:
+            print(f"{year}-{month:02d}: Sent ${sent:.2f}, Received ${received:.2f}")
+
+        # Operational metrics, shown with WALLET_LOG_LEVEL=DEBUG
+        if log.isEnabledFor(logging.DEBUG):
+            stats = self.statement_cache.stats()
+            log.debug("Statement cache: %d hits / %d lookups (%.1f%%), %d entries, ~%.1f KB",
+                      stats['hits'], stats['hits'] + stats['misses'], stats['hit_rate'] * 100,
+                      stats['entries'], stats['memory_bytes'] / 1024)
+
+    def _fetch_statement(self, cursor, ssn, start, end):
+        """Run the statement queries for one user and date range, including archived months"""
+        start_date_formatted = f"{start:%Y-%m-%d} 00:00:00"
+        end_date_formatted = f"{end:%Y-%m-%d} 23:59:59"
+
+        total_sent = 0
+        total_received = 0
+        monthly = {}
+        for table in transaction_tables(cursor):
             # Total sent and received
-            total_sent_query = """
+            total_sent_query = f"""
             SELECT SUM(Amount) as total_sent
-            FROM SEND_TRANSACTION
+            FROM {table}
             WHERE Sender_SSN = %s AND Date_Time_Initiated BETWEEN %s AND %s
             """
-            cursor.execute(total_sent_query, (self.current_user_ssn, start_date_formatted, end_date_formatted))
-            total_sent = cursor.fetchone()[0] or 0
+            cursor.execute(total_sent_query, (ssn, start_date_formatted, end_date_formatted))
+            total_sent += cursor.fetchone()[0] or 0
 
-            total_received_query = """
+            total_received_query = f"""
             SELECT SUM(Amount) as total_received
-            FROM SEND_TRANSACTION
+            FROM {table}
             WHERE Recipient_SSN = %s AND Date_Time_Initiated BETWEEN %s AND %s
             """
-            cursor.execute(total_received_query, (self.current_user_ssn, start_date_formatted, end_date_formatted))
-            total_received = cursor.fetchone()[0] or 0
-
-            print("\n--- Transaction Statement ---")
-            print(f"Period: {start_date} to {end_date}")
-            print(f"Total Amount Sent: ${total_sent:.2f}")
-            print(f"Total Amount Received: ${total_received:.2f}")
+            cursor.execute(total_received_query, (ssn, start_date_formatted, end_date_formatted))
+            total_received += cursor.fetchone()[0] or 0
 
             # Monthly breakdown
-            monthly_breakdown_query = """
+            monthly_breakdown_query = f"""
             SELECT 
                 EXTRACT(YEAR FROM Date_Time_Initiated) as year,
                 EXTRACT(MONTH FROM Date_Time_Initiated) as month,
                 SUM(CASE WHEN Sender_SSN = %s THEN Amount ELSE 0 END) as total_sent,
                 SUM(CASE WHEN Recipient_SSN = %s THEN Amount ELSE 0 END) as total_received
-            FROM SEND_TRANSACTION
+            FROM {table}
             WHERE Date_Time_Initiated BETWEEN %s AND %s
             GROUP BY year, month
-            ORDER BY year, month
             """
             cursor.execute(monthly_breakdown_query, (
-                self.current_user_ssn, 
-                self.current_user_ssn, 
+                ssn, 
+                ssn, 
                 start_date_formatted, 
                 end_date_formatted
             ))
-            
-            print("\nMonthly Breakdown:")
-            for row in cursor.fetchall():
-                print(f"{int(row[0])}-{int(row[1]):02d}: Sent ${row[2]:.2f}, Received ${row[3]:.2f}")
+            for year, month, sent, received in cursor.fetchall():
+                key = (int(year), int(month))
+                previous_sent, previous_received = monthly.get(key, (0, 0))
+                monthly[key] = (previous_sent + sent, previous_received + received)
+
+        return {
+            'total_sent': total_sent,
+            'total_received': total_received,
+            'monthly': [(year, month, sent, received) for (year, month), (sent, received) in sorted(monthly.items())]
+        }
 
-        except psycopg2.Error as e:
-            print("Statement retrieval failed:", e)
-        finally:
-            if conn:
-                cursor.close()
-                conn.close()
+    def _recent_transactions(self, cursor, ssn, limit=5):
+        """Latest transfers for a user, bounded by date so partitioned tables are pruned"""
+        recent_transactions_query = """
+        (SELECT Recipient_SSN as Other_Party, Amount, 'SENT' as Type, Date_Time_Initiated 
+        FROM {table} 
+        WHERE Sender_SSN = %s AND Date_Time_Initiated >= %s
+        ORDER BY Date_Time_Initiated DESC
+        LIMIT %s)
+        UNION ALL
+        (SELECT Sender_SSN as Other_Party, Amount, 'RECEIVED' as Type, Date_Time_Initiated 
+        FROM {table} 
+        WHERE Recipient_SSN = %s AND Date_Time_Initiated >= %s
+        ORDER BY Date_Time_Initiated DESC
+        LIMIT %s)
+        ORDER BY Date_Time_Initiated DESC
+        LIMIT %s
+        """
+        # Look at the last few months first; quiet accounts fall back to their full history
+        for since in (datetime.now() - timedelta(days=RECENT_WINDOW_DAYS), datetime(1970, 1, 1)):
+            cursor.execute(recent_transactions_query.format(table='SEND_TRANSACTION'),
+                           (ssn, since, limit, ssn, since, limit, limit))
+            recent_transactions = cursor.fetchall()
+            if len(recent_transactions) >= limit:
+                return recent_transactions
+
+        # Archived partitions hold only months older than anything still live
+        for table in transaction_tables(cursor)[1:]:
+            cursor.execute(recent_transactions_query.format(table=table),
+                           (ssn, since, limit, ssn, since, limit, limit))
+            recent_transactions += cursor.fetchall()
+
+        return recent_transactions[:limit]
+
+    def _after_transfer_commit(self, sender_ssn, recipient_ssn, amount, timestamp=None):
+        """Drop cached statements a committed transfer makes stale and count the payment"""
+        timestamp = timestamp or datetime.now()
+        self.statement_cache.invalidate(sender_ssn, timestamp)
+        self.statement_cache.invalidate(recipient_ssn, timestamp)
+
+        if self.pay_counts is not None and self.pay_counts[0] == sender_ssn:
+            self.pay_counts[1][recipient_ssn] = self.pay_counts[1].get(recipient_ssn, 0) + 1
 
     def manage_account(self):
         """Account management menu"""
@@ -425,6 +963,8 @@ class WalletPaymentNetwork:
                 """
                 cursor.execute(update_query, (name, self.current_user_ssn))
                 conn.commit()
+                if self.contact_directory is not None:
+                    self.contact_directory.rename(self.current_user_ssn, name)
                 print("Name updated successfully.")
             
             if email:
@@ -469,6 +1009,8 @@ class WalletPaymentNetwork:
                 self.current_user_ssn, email, False, False
             ))
             conn.commit()
+            if self.contact_directory is not None:
+                self.contact_directory.add('email', email, self.current_user_ssn)
             print("Email address added successfully.")
 
         except psycopg2.Error as e:
@@ -528,6 +1070,8 @@ class WalletPaymentNetwork:
                 """
                 cursor.execute(remove_email_query, (self.current_user_ssn, email_to_remove))
                 conn.commit()
+                if self.contact_directory is not None:
+                    self.contact_directory.remove('email', email_to_remove, self.current_user_ssn)
                 print(f"Email {email_to_remove} removed successfully.")
 
             except (ValueError, IndexError):
@@ -565,6 +1109,8 @@ class WalletPaymentNetwork:
                 self.current_user_ssn, phone, False, False
             ))
             conn.commit()
+            if self.contact_directory is not None:
+                self.contact_directory.add('phone', phone, self.current_user_ssn)
             print("Phone number added successfully.")
 
         except psycopg2.Error as e:
@@ -624,6 +1170,8 @@ class WalletPaymentNetwork:
                 """
                 cursor.execute(remove_phone_query, (self.current_user_ssn, phone_to_remove))
                 conn.commit()
+                if self.contact_directory is not None:
+                    self.contact_directory.remove('phone', phone_to_remove, self.current_user_ssn)
                 print(f"Phone number {phone_to_remove} removed successfully.")
 
             except (ValueError, IndexError):
@@ -660,12 +1208,16 @@ class WalletPaymentNetwork:
             print("All fields are required.")
             return
 
+        # Settlement picks the ACH transaction code from this value
+        account_type_fin = {'C': 'CHECKING', 'S': 'SAVINGS'}.get(account_type.strip().upper())
+        if account_type_fin is None:
+            print("Invalid account type. Enter C or S.")
+            return
+
         try:
             conn = self.connect_db()
             cursor = conn.cursor()
 
-            account_type_fin = account_type == 'C' if 'CHECKING' else 'SAVINGS' 
-
             insert_bank_query = """
             INSERT INTO BANK_ACCOUNT 
             (BankID, BANUmber, WalletAccountSSN, Bank_Name, Account_Type, RoutingNumber, Is_Primary, Verified) 
@@ -698,7 +1250,7 @@ class WalletPaymentNetwork:
 
             # Retrieve user's bank accounts
             get_bank_query = """
-            SELECT Bank_Name, BANUmber, Is_Primary 
+            SELECT Bank_Name, BANUmber, Is_Primary, BankID 
             FROM BANK_ACCOUNT 
             WHERE WalletAccountSSN = %s
             """
@@ -710,7 +1262,7 @@ class WalletPaymentNetwork:
                 return
 
             print("Your bank accounts:")
-            for i, (bank_name, account_number, is_primary) in enumerate(bank_accounts, 1):
+            for i, (bank_name, account_number, is_primary, _) in enumerate(bank_accounts, 1):
                 primary_status = " (Primary)" if is_primary else ""
                 print(f"{i}. {bank_name} - {account_number}{primary_status}")
 
@@ -729,6 +1281,11 @@ class WalletPaymentNetwork:
                     print("Cannot remove primary bank account.")
                     return
 
+                # Top-ups and withdrawals still in flight need the account to settle
+                if self._outstanding_bank_transfers(cursor, bank_accounts[bank_index][3]):
+                    print("Cannot remove a bank account with pending top-ups or withdrawals.")
+                    return
+
                 # Remove bank account
                 remove_bank_query = """
                 DELETE FROM BANK_ACCOUNT 
@@ -741,13 +1298,159 @@ class WalletPaymentNetwork:
             except (ValueError, IndexError):
                 print("Invalid selection.")
 
-        except psycopg2.Error as e:
+        except Error as e:
             conn.rollback()
             print("Failed to remove bank account:", e)
         finally:
             if conn:
                 cursor.close()
                 conn.close()
+
+    def _outstanding_bank_transfers(self, cursor, bank_id):
+        """Number of queued or batched bank transfers using this bank account"""
+        outstanding_query = """
+        SELECT COUNT(*) 
+        FROM BANK_TRANSFER 
+        WHERE BankID = %s AND Status IN ('PENDING', 'BATCHED')
+        """
+        try:
+            cursor.execute(outstanding_query, (bank_id,))
+        except Error as e:
+            # BANK_TRANSFER only exists once settlement is set up
+            if e.errno == errorcode.ER_NO_SUCH_TABLE:
+                return 0
+            raise
+        return cursor.fetchone()[0]
+
+    def payment_methods(self):
+        """Bank top-up and withdrawal menu"""
+        while True:
+            print("\n--- Payment Methods ---")
+            print("1. Add Money from Bank")
+            print("2. Withdraw to Bank")
+            print("3. View Bank Transfers")
+            print("4. Return to Main Menu")
+
+            choice = input("Enter your choice: ")
+
+            if choice == '1':
+                self.queue_bank_transfer('TOPUP')
+            elif choice == '2':
+                self.queue_bank_transfer('WITHDRAWAL')
+            elif choice == '3':
+                self.view_bank_transfers()
+            elif choice == '4':
+                break
+            else:
+                print("Invalid choice. Try again.")
+
+    def queue_bank_transfer(self, direction):
+        """Queue a top-up or withdrawal for the next settlement batch"""
+        if not self.current_user_ssn:
+            print("Please log in first.")
+            return
+
+        try:
+            conn = self.connect_db()
+            cursor = conn.cursor()
+
+            get_bank_query = """
+            SELECT BankID, Bank_Name, BANUmber 
+            FROM BANK_ACCOUNT 
+            WHERE WalletAccountSSN = %s
+            """
+            cursor.execute(get_bank_query, (self.current_user_ssn,))
+            bank_accounts = cursor.fetchall()
+
+            if not bank_accounts:
+                print("No bank accounts found. Add one under Account Management.")
+                return
+
+            print("Your bank accounts:")
+            for i, (_, bank_name, account_number) in enumerate(bank_accounts, 1):
+                print(f"{i}. {bank_name} - {account_number}")
+
+            choice = input("Enter the number of the bank account (or press Enter to cancel): ")
+            if not choice:
+                return
+
+            try:
+                bank_id, bank_name, _ = bank_accounts[int(choice) - 1]
+                cents = int(self._parse_amount(input("Enter amount: ")) * 100)
+            except (ValueError, IndexError, InvalidOperation):
+                print("Invalid selection.")
+                return
+
+            if cents <= 0:
+                print("Invalid amount entered.")
+                return
+
+            # Withdrawals reserve the funds now; a returned withdrawal is refunded at settlement
+            if direction == 'WITHDRAWAL':
+                self._debit(cursor, self.current_user_ssn, Decimal(cents) / 100)
+
+            insert_transfer_query = """
+            INSERT INTO BANK_TRANSFER 
+            (SSN, BankID, Direction, Amount_Cents, Status) 
+            VALUES (%s, %s, %s, %s, %s)
+            """
+            cursor.execute(insert_transfer_query, (
+                self.current_user_ssn, bank_id, direction, cents, 'PENDING'
+            ))
+            conn.commit()
+
+            if direction == 'WITHDRAWAL':
+                print(f"Withdrawal of ${cents / 100:.2f} to {bank_name} queued for settlement.")
+            else:
+                print(f"Top-up of ${cents / 100:.2f} from {bank_name} queued; funds arrive once settled.")
+
+        except Error as e:
+            conn.rollback()
+            print("Bank transfer failed:", e)
+        except InsufficientFundsError:
+            conn.rollback()
+            print("Insufficient balance.")
+        finally:
+            if conn:
+                cursor.close()
+                conn.close()
+
+    def view_bank_transfers(self):
+        """List the user's recent top-ups and withdrawals"""
+        if not self.current_user_ssn:
+            print("Please log in first.")
+            return
+
+        try:
+            conn = self.connect_db()
+            cursor = conn.cursor()
+
+            bank_transfers_query = """
+            SELECT bt.Direction, bt.Amount_Cents, bt.Status, bt.Return_Code, bt.Date_Time_Initiated, ba.Bank_Name
+            FROM BANK_TRANSFER bt
+            JOIN BANK_ACCOUNT ba ON ba.BankID = bt.BankID
+            WHERE bt.SSN = %s
+            ORDER BY bt.Transfer_ID DESC
+            LIMIT 10
+            """
+            cursor.execute(bank_transfers_query, (self.current_user_ssn,))
+            transfers = cursor.fetchall()
+
+            print("\nBank Transfers:")
+            if not transfers:
+                print("No bank transfers")
+            for direction, cents, status, return_code, date, bank_name in transfers:
+                label = "Top-up from" if direction == 'TOPUP' else "Withdrawal to"
+                status = f"{status} ({return_code})" if return_code else status
+                print(f"- {label} {bank_name}: ${cents / 100:.2f} on {date} [{status}]")
+
+        except Error as e:
+            print("Failed to retrieve bank transfers:", e)
+        finally:
+            if conn:
+                cursor.close()
+                conn.close()
+
     def get_account_info(self):
         """Retrieve and display comprehensive account information"""
         if not self.current_user_ssn:
@@ -772,6 +1475,7 @@ class WalletPaymentNetwork:
                 return
 
             name, email, phone, balance = account_info
+            balance += self._slot_balance(cursor, self.current_user_ssn)
 
             # Retrieve additional email addresses
             emails_query = """
@@ -801,19 +1505,7 @@ class WalletPaymentNetwork:
             bank_accounts = cursor.fetchall()
 
             # Retrieve recent transactions
-            recent_transactions_query = """
-            (SELECT Recipient_SSN as Other_Party, Amount, 'SENT' as Type, Date_Time_Initiated 
-            FROM SEND_TRANSACTION 
-            WHERE Sender_SSN = %s)
-            UNION
-            (SELECT Sender_SSN as Other_Party, Amount, 'RECEIVED' as Type, Date_Time_Initiated 
-            FROM SEND_TRANSACTION 
-            WHERE Recipient_SSN = %s)
-            ORDER BY Date_Time_Initiated DESC
-            LIMIT 5
-            """
-            cursor.execute(recent_transactions_query, (self.current_user_ssn, self.current_user_ssn))
-            recent_transactions = cursor.fetchall()
+            recent_transactions = self._recent_transactions(cursor, self.current_user_ssn)
 
             # Display account information
             print("\n--- Account Information ---")
@@ -858,6 +1550,7 @@ class WalletPaymentNetwork:
                 conn.close()
 
 def main():
+    logging.basicConfig(level=os.getenv("WALLET_LOG_LEVEL", "WARNING").upper())
     wallet_app = WalletPaymentNetwork()
     
     while True:
@@ -878,8 +1571,9 @@ def main():
                     print("3. Request Money")
                     print("4. Statements")
                     print("5. Account Management")
-                    print("6. Payment Methods")
-                    print("7. Sign Out")
+                    print("6. Split Bill")
+                    print("7. Payment Methods")
+                    print("8. Sign Out")
                     
                     menu_choice = input("Enter your choice: ")
                     
@@ -894,6 +1588,10 @@ def main():
                     elif menu_choice == '5':
                         wallet_app.manage_account()
                     elif menu_choice == '6':
+                        wallet_app.split_bill()
+                    elif menu_choice == '7':
+                        wallet_app.payment_methods()
+                    elif menu_choice == '8':
                         wallet_app.current_user_ssn = None
                         break
                     else:
@@ -903,6 +1601,9 @@ def main():
             wallet_app.register_account()
         
         elif choice == '3':
+            wallet_app.save_contact_directory()
+            if wallet_app.group_commit is not None:
+                wallet_app.group_commit.close()
             print("Thank you for using WALLET Payment Network!")
             break
         